@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Optional, Tuple
+import argparse
+import time
+
+import numpy as np  # type: ignore
+import psutil  # type: ignore
+
+import field
+
+# Auto-tuned slabs aim for tasks about this long: long enough that pickling
+# and scheduling overhead is noise, short enough that the surface still fills
+# in smoothly and cancellation doesn't have to wait long.
+TARGET_TASK_SECONDS = 0.05
+KINDS = ["serial", "threads", "processes"]
+
+
+def default_workers() -> int:
+    # Leave 1 for the UI.  Hyperthreading isn't really good enough to
+    # eliminate jank--I have to leave a whole physical CPU free.
+    return max(psutil.cpu_count(logical=False) - 1, 1)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds --backend, --workers and --chunk, for making a Backend from."""
+    parser.add_argument(
+        "--backend",
+        choices=KINDS,
+        default="processes",
+        help="where the field gets computed",
+    )
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument(
+        "--chunk",
+        type=int,
+        default=None,
+        help="slices per field task; tuned from measured cost if not given",
+    )
+
+
+class SerialExecutor(Executor):
+    """Runs each task to completion inside submit().  Under asyncio that
+    blocks the event loop for the length of the task, so it's mostly useful
+    for small grids and for measuring the other backends against."""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:  # pylint: disable=broad-except
+            future.set_exception(error)
+        return future
+
+
+def timed_field_for_slab(*args) -> Tuple[np.ndarray, float]:
+    """field.get_field_for_slab, plus how long it took where it ran."""
+    start = time.perf_counter()
+    output = field.get_field_for_slab(*args)
+    return output, time.perf_counter() - start
+
+
+class Backend:
+    """Where field slabs get computed, and how many slices go in each.
+
+    With chunk=None the slab size is tuned from the measured cost of earlier
+    tasks, aiming for tasks of about TARGET_TASK_SECONDS each while keeping at
+    least two tasks per worker.
+    """
+
+    def __init__(
+        self, kind: str, workers: int = 1, chunk: Optional[int] = None
+    ):
+        self.kind = kind
+        self.workers = workers
+        self.chunk = chunk
+        # Measured cost per grid point, so that it carries over when the grid
+        # size changes.
+        self.seconds_per_point: Optional[float] = None
+        self.executor: Executor
+        if kind == "serial":
+            self.executor = SerialExecutor()
+            self.workers = 1
+        elif kind == "threads":
+            # This only helps because NumPy drops the GIL inside its loops.
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        elif kind == "processes":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError(f"Unknown backend {kind!r}")
+
+    def __enter__(self) -> "Backend":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+    def slab_size(self, samples: int) -> int:
+        if self.chunk is not None:
+            return max(1, min(self.chunk, samples))
+        most = max(1, samples // (2 * self.workers))
+        if self.seconds_per_point is None:
+            return max(1, most // 2)
+        # A task can finish within the clock's resolution and time at zero.
+        per_slice = max(self.seconds_per_point * samples * samples, 1e-9)
+        wanted = round(TARGET_TASK_SECONDS / per_slice)
+        return max(1, min(wanted, most))
+
+    def record(self, points: int, seconds: float) -> None:
+        """Folds the measured cost of a finished task into the estimate."""
+        per_point = seconds / points
+        if self.seconds_per_point is None:
+            self.seconds_per_point = per_point
+        else:
+            self.seconds_per_point = (
+                0.8 * self.seconds_per_point + 0.2 * per_point
+            )
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Headless benchmark of the field and meshing path behind bounce.py.
+
+This sweeps grid resolution, ball count, and the way the field gets computed,
+timing each stage separately, and writes the results out as JSON.  No window
+is opened, so it runs anywhere the numerical dependencies are installed.
+
+    ./benchmark.py --samples 30 64 128 --balls 10 100 --output bench.json
+"""
+
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import pickle
+import platform
+import time
+
+import numpy as np  # type: ignore
+import psutil  # type: ignore
+
+import backends
+import field
+import kernels
+from field import BallFieldInfo
+import mesh
+import physics
+import voxels
+
+# The scalar backends do millions of Python-level operations per slice; past
+# this resolution they'd take longer than everything else put together.
+DEFAULT_MAX_SCALAR_SAMPLES = 40
+
+
+def field_serial(
+    field_info: Sequence[BallFieldInfo],
+    samples: int,
+    executor,
+    chunk: int,
+    kernel: kernels.Kernel,
+) -> np.ndarray:
+    """The original per-point code, in this process.  It only knows the
+    original kernel."""
+    return np.array(
+        [
+            field.get_field_for_slice(field_info, samples, None, i)
+            for i in range(samples)
+        ]
+    )
+
+
+def field_process_slices(
+    field_info: Sequence[BallFieldInfo],
+    samples: int,
+    executor,
+    chunk: int,
+    kernel: kernels.Kernel,
+) -> np.ndarray:
+    """What bounce.py has always done: one per-point task per x-slice."""
+    futures = [
+        executor.submit(
+            field.get_field_for_slice, field_info, samples, None, i
+        )
+        for i in range(samples)
+    ]
+    return np.array([future.result() for future in futures])
+
+
+def field_vectorized(
+    field_info: Sequence[BallFieldInfo],
+    samples: int,
+    executor,
+    chunk: int,
+    kernel: kernels.Kernel,
+) -> np.ndarray:
+    return field.get_field(field_info, samples, chunk, kernel)
+
+
+def field_pool_slabs(
+    field_info: Sequence[BallFieldInfo],
+    samples: int,
+    executor,
+    chunk: int,
+    kernel: kernels.Kernel,
+) -> np.ndarray:
+    """Vectorized slabs of chunk slices each, spread over a thread or process
+    pool."""
+    futures = [
+        executor.submit(
+            field.get_field_for_slab,
+            field_info,
+            samples,
+            (i, min(i + chunk, samples)),
+            kernel,
+        )
+        for i in range(0, samples, chunk)
+    ]
+    return np.concatenate([future.result() for future in futures])
+
+
+# Name -> (function, whether it's scalar Python, the kind of pool it uses).
+BACKENDS: Dict[str, Tuple[Callable[..., np.ndarray], bool, Optional[str]]] = {
+    "serial": (field_serial, True, None),
+    "process-slices": (field_process_slices, True, "processes"),
+    "vectorized": (field_vectorized, False, None),
+    "thread-slabs": (field_pool_slabs, False, "threads"),
+    "process-slabs": (field_pool_slabs, False, "processes"),
+}
+CHUNKED_BACKENDS = {"vectorized", "thread-slabs", "process-slabs"}
+
+
+def best_time(
+    repeat: int, function: Callable[..., Any], *args
+) -> Tuple[float, Any]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def transfer_time(output: np.ndarray, pieces: int) -> float:
+    """Time to pickle and unpickle the field in as many pieces as the pool
+    would ship it back in.  That's the part of the process backends' cost
+    that's pure overhead."""
+    start = time.perf_counter()
+    for piece in np.array_split(output, pieces):
+        pickle.loads(pickle.dumps(piece, protocol=pickle.HIGHEST_PROTOCOL))
+    return time.perf_counter() - start
+
+
+def warm_up(executor: Executor, workers: int) -> float:
+    """Starts every worker process, so the timings below see a warm pool,
+    like the GUI does after its first capture."""
+    start = time.perf_counter()
+    list(executor.map(time.sleep, [0.01] * workers))
+    return time.perf_counter() - start
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    report: Dict[str, Any] = {
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "physical_cpus": psutil.cpu_count(logical=False),
+            "logical_cpus": psutil.cpu_count(logical=True),
+        },
+        "workers": args.workers,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with backends.Backend(
+        "processes", args.workers
+    ) as processes, backends.Backend("threads", args.workers) as threads:
+        pools = {"processes": processes.executor, "threads": threads.executor}
+        report["pool_startup_seconds"] = warm_up(
+            processes.executor, args.workers
+        )
+        for balls in args.balls:
+            system = physics.BallSystem.scattered(
+                balls, 0, rng=np.random.default_rng(args.seed)
+            )
+            field_info = field.field_info_for_system(system)
+            for kernel_name in args.kernels:
+                for samples in args.samples:
+                    entry = run_one(
+                        args, pools, field_info, kernel_name, balls, samples
+                    )
+                    results.append(entry)
+    return report
+
+
+def run_one(
+    args: argparse.Namespace,
+    pools: Dict[str, Executor],
+    field_info: Sequence[BallFieldInfo],
+    kernel_name: str,
+    balls: int,
+    samples: int,
+) -> Dict[str, Any]:
+    kernel = kernels.KERNELS[kernel_name]
+    timings: List[Dict[str, Any]] = []
+    reference: Optional[np.ndarray] = None
+    for name in args.backends:
+        function, scalar, pool = BACKENDS[name]
+        if scalar and (
+            samples > args.max_scalar_samples
+            or kernel is not kernels.DEFAULT_KERNEL
+        ):
+            continue
+        chunks = args.chunks if name in CHUNKED_BACKENDS else [1]
+        for chunk in chunks:
+            seconds, output = best_time(
+                args.repeat,
+                function,
+                field_info,
+                samples,
+                pools.get(pool),
+                chunk,
+                kernel,
+            )
+            if reference is None:
+                reference = output
+            record = {
+                "backend": name,
+                "chunk": chunk,
+                "field_seconds": seconds,
+                "transfer_seconds": (
+                    transfer_time(output, -(-samples // chunk))
+                    if pool == "processes"
+                    else None
+                ),
+                "max_difference": float(np.abs(output - reference).max()),
+            }
+            print(
+                f"{balls} balls, {samples}^3, {kernel_name}, {name} x{chunk}: "
+                f"{seconds:.3f}s"
+            )
+            timings.append(record)
+
+    if reference is None:
+        reference = field.get_field(field_info, samples, kernel=kernel)
+    surface_seconds, surface = best_time(
+        args.repeat, mesh.mesh_from_field, reference, field.SURFACE_LEVEL
+    )
+    voxel_seconds, quads = best_time(
+        args.repeat, voxels.make_voxel_mesh, reference > field.SURFACE_LEVEL
+    )
+    return {
+        "samples": samples,
+        "balls": balls,
+        "kernel": kernel_name,
+        "backends": timings,
+        "marching_cubes_seconds": surface_seconds,
+        "triangles": len(surface.triangles),
+        "voxel_seconds": voxel_seconds,
+        "voxel_quads": len(quads.indices) // 4,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--samples", type=int, nargs="+", default=[30, 64, 128, 256]
+    )
+    parser.add_argument("--balls", type=int, nargs="+", default=[10, 100])
+    parser.add_argument(
+        "--kernels",
+        nargs="+",
+        choices=list(kernels.KERNELS),
+        default=["inverse-cube"],
+        help="the per-point backends only run with inverse-cube",
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=list(BACKENDS),
+        default=list(BACKENDS),
+    )
+    parser.add_argument(
+        "--chunks",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16],
+        help="slices per task for the chunked backends",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=backends.default_workers()
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-scalar-samples",
+        type=int,
+        default=DEFAULT_MAX_SCALAR_SAMPLES,
+        help="skip the per-point backends above this resolution",
+    )
+    parser.add_argument("--output", default="bounce_benchmark.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
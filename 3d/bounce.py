@@ -1,68 +1,83 @@
 #!/usr/bin/env python3
 
-from itertools import chain
-from concurrent.futures import ProcessPoolExecutor
-from typing import NamedTuple, List, Sequence, Any, Iterator, Tuple
-import multiprocessing
-import queue
-import random
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+import argparse
 import sys
+import time
 import asyncio
 
 import numpy as np  # type: ignore
 
-# mcubes requires scipy
-import mcubes  # type: ignore
 import pyglet  # type: ignore
 from pyglet import gl  # Requires PyOpenGL PyOpenGL_accelerate
-import psutil  # type: ignore
 
+import backends
+import field
+from field import SURFACE_LEVEL
+import gpu
+from gpu import fill_attribute
+import jobs
+import kernels
+import mesh
+import physics
+from physics import EXPECTED_FRAME_RATE
 import shapes
-
-EPSILON = 0.001
-EXPECTED_FRAME_RATE = 1 / 65.0
-
-
-def concat(lists: Sequence[Iterator[Any]]) -> Iterator[Any]:
-    return chain.from_iterable(lists)
-
-
-class BallFieldInfo(NamedTuple):
-    charge: float
-    size: float
-    coords: np.ndarray
-
-
-def get_field_for_point(
-    field_info: Sequence[BallFieldInfo], coords: np.ndarray
-) -> float:
-    strength = 0.0
-    for shape in field_info:
-        distance = np.linalg.norm(coords - shape.coords)
-        if distance < shape.size + EPSILON:
-            strength += shape.charge
-        else:
-            strength += shape.charge / ((1 + 4 * (distance - shape.size)) ** 3)
-    return strength
-
-
-def get_field_for_slice(
-    field_info: Sequence[BallFieldInfo], samples: int, progress_queue, i: int
-) -> float:
-    samples_imaginary = samples * 1j
-    x = i * 2 / (samples - 1) - 1
-    y_values, z_values = np.mgrid[
-        -1:1:samples_imaginary,  # type: ignore
-        -1:1:samples_imaginary,  # type: ignore
-    ]
-    output = np.zeros([samples, samples])
-    for j in range(samples):
-        for k in range(samples):
-            y = y_values[j][k]
-            z = z_values[j][k]
-            output[j][k] = get_field_for_point(field_info, np.array([x, y, z]))
-    progress_queue.put(i)
-    return output
+import voxels
+
+
+def add_surface_piece(batch: pyglet.graphics.Batch, piece: mesh.Mesh) -> None:
+    vertex_list = batch.add_indexed(
+        len(piece.vertices),
+        gl.GL_TRIANGLES,
+        None,
+        # pyglet offsets every index itself, which goes much faster over
+        # Python ints than over NumPy scalars.
+        piece.triangles.reshape(-1).tolist(),
+        # Static attributes get interleaved into one buffer, which would stop
+        # fill_attribute from copying each of them in one go.
+        "v3f",
+        "n3f",
+        "c4B",
+    )
+    fill_attribute(vertex_list.vertices, piece.vertices)
+    fill_attribute(vertex_list.normals, piece.normals)
+    fill_attribute(
+        vertex_list.colors, np.array([64, 64, 192, 128], dtype=np.uint8)
+    )
+
+
+class FrameTimings:
+    """Rolling averages of how long each phase of a frame takes."""
+
+    PHASES = ["update", "events", "draw", "progress", "flip", "idle"]
+
+    def __init__(self, frames: int = 60):
+        self.history: Dict[str, Deque[float]] = {
+            phase: deque(maxlen=frames) for phase in self.PHASES
+        }
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.history[phase].append(time.perf_counter() - start)
+
+    def averages(self) -> Dict[str, float]:
+        return {
+            phase: sum(times) / len(times)
+            for (phase, times) in self.history.items()
+            if times
+        }
+
+    def summary(self) -> str:
+        return "  ".join(
+            f"{phase} {seconds * 1000:.1f}ms"
+            for (phase, seconds) in self.averages().items()
+        )
 
 
 class Shape:
@@ -72,14 +87,11 @@ class Shape:
     def update(self, frame_scaling: float):
         pass
 
-    def field_info(self):
-        return None
-
 
 class Box(Shape):
     def __init__(self):
         # fmt: off
-        self.wall_coords = [
+        wall_coords = [
             -1, -1, -1,
             -1, -1,  1,
             -1,  1, -1,
@@ -89,7 +101,7 @@ class Box(Shape):
              1,  1, -1,
              1,  1,  1,
         ]
-        self.wall_indices = [
+        wall_indices = [
             0, 1, 3, 2,  # Left wall
             4, 5, 7, 6,  # Right wall
             2, 3, 7, 6,  # Ceiling
@@ -98,131 +110,117 @@ class Box(Shape):
         # fmt: on
         floor_color = (64, 64, 64)
         ceiling_color = (192, 192, 192)
-        self.wall_colors = tuple((2 * floor_color + 2 * ceiling_color) * 2)
-        self.wall_vertex_count = len(self.wall_coords) // 3
-        self.back_indices = [0, 2, 6, 4]
-        self.back_colors = tuple(8 * [32, 32, 64])
-
-    def draw(self):
-        pyglet.graphics.draw_indexed(
-            self.wall_vertex_count,
+        wall_colors = tuple((2 * floor_color + 2 * ceiling_color) * 2)
+        back_indices = [0, 2, 6, 4]
+        back_colors = tuple(8 * [32, 32, 64])
+        # None of this ever changes, so it goes to pyglet once, up front.
+        self.batch = pyglet.graphics.Batch()
+        self.batch.add_indexed(
+            len(wall_coords) // 3,
             gl.GL_QUADS,
-            self.wall_indices,
-            ("v3f", self.wall_coords),
-            ("c3B", self.wall_colors),
+            None,
+            wall_indices,
+            ("v3f/static", wall_coords),
+            ("c3B/static", wall_colors),
         )
-        pyglet.graphics.draw_indexed(
-            self.wall_vertex_count,
+        self.batch.add_indexed(
+            len(wall_coords) // 3,
             gl.GL_QUADS,
-            self.back_indices,
-            ("v3f", self.wall_coords),
-            ("c3B", self.back_colors),
+            None,
+            back_indices,
+            ("v3f/static", wall_coords),
+            ("c3B/static", back_colors),
         )
 
+    def draw(self):
+        self.batch.draw()
 
-class VoxelList(Shape):
-    def __init__(
-        self, coords_list: Sequence[Tuple[int, int, int]], size: float
-    ):
-        self.coords_list = coords_list
-        self.size = size
-        # fmt: off
-        wall_coords_template = np.array([
-            [-1, -1, -1],
-            [-1, -1,  1],
-            [-1,  1, -1],
-            [-1,  1,  1],
-            [ 1, -1, -1],
-            [ 1, -1,  1],
-            [ 1,  1, -1],
-            [ 1,  1,  1],
-        ]) * size
-        wall_indices_template = np.array([
-            0, 1, 3, 2,  # Left wall
-            4, 5, 7, 6,  # Right wall
-            2, 3, 7, 6,  # Ceiling
-            0, 1, 5, 4,  # Floor
-            1, 3, 7, 5,  # Front
-        ])
-        wall_coords = []
-        wall_indices = []
-        num_vertices_in_template = len(wall_coords_template)
-        for (index, coords) in enumerate(coords_list):
-            wall_coords.append(concat(wall_coords_template + coords))
-            wall_indices.append(wall_indices_template +
-                                index * num_vertices_in_template)
-        self.wall_coords = tuple(concat(wall_coords))
-        self.wall_indices = tuple(concat(wall_indices))
 
-        # fmt: on
-        self.wall_vertex_count = len(self.wall_coords) // 3
-        self.wall_colors = self.wall_vertex_count * (64, 192, 64, 128)
+class VoxelList(Shape):
+    def __init__(self, mesh: voxels.QuadMesh):
+        # The mesh only holds faces that border empty space, already merged
+        # into larger quads, so there's no per-voxel work left to do here.
+        self.vertex_list = None
+        vertex_count = len(mesh.vertices) // 3
+        if not vertex_count:
+            return
+        self.vertex_list = pyglet.graphics.vertex_list_indexed(
+            vertex_count, mesh.indices.tolist(), "v3f", "c4B"
+        )
+        fill_attribute(self.vertex_list.vertices, mesh.vertices)
+        fill_attribute(
+            self.vertex_list.colors,
+            np.array([64, 192, 64, 128], dtype=np.uint8),
+        )
 
     def draw(self):
-        pyglet.graphics.draw_indexed(
-            self.wall_vertex_count,
-            gl.GL_QUADS,
-            self.wall_indices,
-            ("v3f", self.wall_coords),
-            ("c4B", self.wall_colors),
-        )
+        if self.vertex_list:
+            self.vertex_list.draw(gl.GL_QUADS)
 
 
-class Ball(Shape):
-    def __init__(self, x: float, y: float, z: float):
-        # Just because we ask for a float, doesn't mean we get it.  Mypy will
-        # happily accept int as float, but numpy will blow up on it later.
-        self.coords = np.array([float(x), float(y), float(z)])
-        self.size = 0.1
-        geometry = shapes.make_sphere_geometry(4)
-        self.vertices = tuple(i for i in concat(geometry.points))
-        self.indices = tuple(geometry.faces)
-        self.colors = geometry.colors
-        # Not uniform over the sphere, but fine for this application.
-        speed = 0.5 * EXPECTED_FRAME_RATE
-
-        self.velocity = np.array(
-            [
-                random.random() * speed,
-                random.random() * speed,
-                random.random() * speed,
-            ]
-        )
-        self.charge = 1.0
+class Camera:
+    """Where we look at the box from, and how big things come out on
+    screen."""
 
-    def draw(self):
-        gl.glPushMatrix()
-        gl.glTranslatef(self.coords[0], self.coords[1], self.coords[2])
-        gl.glScalef(self.size, self.size, self.size)
-        pyglet.graphics.draw_indexed(
-            len(self.vertices) // 3,
-            gl.GL_TRIANGLES,
-            self.indices,
-            ("v3f", self.vertices),
-            ("c4B", self.colors),
-        )
-        gl.glPopMatrix()
+    def __init__(self, field_of_view: float = 85, distance: float = 2):
+        self.field_of_view = field_of_view
+        # From the eye to the center of the box, along z.
+        self.distance = distance
+        self.near = 0.1
+        self.viewport_height = 1
 
-    def update(self, frame_scaling: float):
-        self.coords += self.velocity * frame_scaling
-        wall_buffer = 0.15
-        for (index, component) in enumerate(self.coords):
-            upper_bound = 1 - wall_buffer
-            lower_bound = -1 + wall_buffer
-            if component > upper_bound:
-                self.coords[index] += 2 * (upper_bound - component)
-                self.velocity[index] = -self.velocity[index]
-            elif component < lower_bound:
-                self.coords[index] += 2 * (lower_bound - component)
-                self.velocity[index] = -self.velocity[index]
-
-    def field_info(self) -> BallFieldInfo:
-        return BallFieldInfo(self.charge, self.size, self.coords)
+    @property
+    def pixels_per_unit(self) -> float:
+        """On-screen size of one unit at a depth of one unit."""
+        half_angle = np.radians(self.field_of_view) / 2
+        return self.viewport_height / 2 / np.tan(half_angle)
+
+    def projected_radii(
+        self, centers: np.ndarray, radii: np.ndarray
+    ) -> np.ndarray:
+        """Roughly how many pixels each sphere's radius covers on screen."""
+        depth = np.maximum(self.distance - centers[..., 2], self.near)
+        return radii * self.pixels_per_unit / depth
+
+
+class Balls(Shape):
+    """Draws every ball in a BallSystem.  They all share one cached chain of
+    spheres, uploaded to the GPU once, and each ball uses the coarsest one
+    that still looks round at the size it's drawn.  All the physics happens
+    on the system's arrays."""
+
+    def __init__(
+        self,
+        system: physics.BallSystem,
+        camera: Camera,
+        lod: shapes.SphereLOD,
+        instanced: bool = True,
+    ):
+        self.system = system
+        self.camera = camera
+        self.lod = lod
+        self.renderer = gpu.make_sphere_renderer(lod, instanced)
+
+    def draw(self):
+        positions = self.system.positions
+        sizes = self.system.sizes
+        radii = self.camera.projected_radii(positions, sizes)
+        levels = self.lod.levels_for_radii(radii)
+        self.renderer.draw(positions, sizes, levels)
 
 
 # pylint: disable=abstract-method
 class AppWindow(pyglet.window.Window):
-    def __init__(self, executor: ProcessPoolExecutor):
+    def __init__(
+        self,
+        backend: backends.Backend,
+        ball_count: int = 10,
+        samples: int = 30,
+        show_hud: bool = False,
+        sphere: str = "icosahedron",
+        instanced: bool = True,
+        target_triangles: Optional[int] = None,
+    ):
         display = pyglet.canvas.get_display()
         screen = display.get_default_screen()
         template = gl.Config(
@@ -234,67 +232,74 @@ class AppWindow(pyglet.window.Window):
         )
         config = screen.get_best_config(template)
         super().__init__(config=config, resizable=True)
-        self.balls: List[Shape]
-        self.balls = [Ball(0, 0, 0) for i in range(10)]
-        box: List[Shape]
-        box = [Box()]
-        self.shapes = box + self.balls
+        self.ball_system = physics.initial_system(ball_count)
+        self.camera = Camera()
+        self.balls = Balls(
+            self.ball_system,
+            self.camera,
+            shapes.sphere_lod(sphere),
+            instanced,
+        )
+        self.shapes: List[Shape] = [Box(), self.balls]
         self.draw_surface = False
         self.surface_to_draw = None
         self.draw_voxels = False
         self.voxels_to_draw = None
-        self.samples = 30
-        self.executor = executor
-        manager = multiprocessing.Manager()
-        # Queue space is cheap, so give it space for all it'll ever hold.
-        self.progress_queue = manager.Queue(self.samples)
-        self.progress_count = 0
-        self.job_in_progress = False
+        self.samples = samples
+        # If set, captured surfaces get decimated to about this many triangles
+        # before they're handed to pyglet.
+        self.surface_triangle_budget = target_triangles
+        self.backend = backend
+        self.job: Optional[jobs.FieldJob] = None
+        self.kernel_name = "inverse-cube"
+        self.timings = FrameTimings()
+        self.show_hud = show_hud
+        self.hud = pyglet.text.Label(
+            "", x=10, anchor_y="top", font_size=10, color=(255, 255, 255, 255)
+        )
         pyglet.clock.schedule_interval(self.update, EXPECTED_FRAME_RATE)
+        # Laying out text every frame would show up in the timings it reports.
+        pyglet.clock.schedule_interval(self.update_hud, 0.25)
 
     def on_key_press(self, symbol, modifiers):
-        def get_field_for_handler(handler):
-            def wrapped_hander(arg):
-                self.job_in_progress = False
-                self.progress_count = 0
-                handler(arg)
-
-            self.job_in_progress = True
-            coroutine = self.field_over_matrix()
-            task = asyncio.ensure_future(coroutine)
-            task.add_done_callback(wrapped_hander)
-
-        if symbol == pyglet.window.key.C and not self.job_in_progress:
-
-            def handler(future):
-                self.surface_to_draw = self.capture_surface(future.result())
-
-            get_field_for_handler(handler)
-        elif symbol == pyglet.window.key.V and not self.job_in_progress:
-
-            def handler(future):
-                self.voxels_to_draw = self.capture_voxels(future.result())
-
-            get_field_for_handler(handler)
-        elif symbol == pyglet.window.key.B and not self.job_in_progress:
-
-            def handler(future):
-                self.surface_to_draw = self.capture_surface(future.result())
-                self.voxels_to_draw = self.capture_voxels(future.result())
-
-            get_field_for_handler(handler)
+        if symbol == pyglet.window.key.C:
+            self.start_capture(want_surface=True, want_voxels=False)
+        elif symbol == pyglet.window.key.V:
+            self.start_capture(want_surface=False, want_voxels=True)
+        elif symbol == pyglet.window.key.B:
+            self.start_capture(want_surface=True, want_voxels=True)
+        elif symbol == pyglet.window.key.X:
+            self.cancel_capture()
         elif symbol == pyglet.window.key.D:
             self.draw_surface = not self.draw_surface
         elif symbol == pyglet.window.key.E:
             self.draw_voxels = not self.draw_voxels
+        elif symbol == pyglet.window.key.F:
+            names = list(kernels.KERNELS)
+            index = names.index(self.kernel_name)
+            self.kernel_name = names[(index + 1) % len(names)]
+            self.set_caption(f"Field kernel: {self.kernel_name}")
+        elif symbol == pyglet.window.key.H:
+            self.show_hud = not self.show_hud
+        elif symbol == pyglet.window.key.K:
+            self.ball_system.collisions = not self.ball_system.collisions
         elif symbol == pyglet.window.key.Q:
             sys.exit()
 
-    async def field_over_matrix(self) -> np.ndarray:
-        field_info: Sequence[BallFieldInfo]
-        field_info = list(
-            filter(None, [shape.field_info() for shape in self.shapes])
-        )
+    def cancel_capture(self) -> None:
+        if self.job:
+            self.job.cancel()
+            self.job = None
+
+    def start_capture(self, want_surface: bool, want_voxels: bool) -> None:
+        """Starts computing the field for the balls where they are now.  The
+        surface fills in slab by slab as the field comes back; voxels need
+        the whole field, so they appear at the end."""
+        # The balls have moved since any job in flight took its snapshot, so
+        # whatever it hasn't finished yet is stale.
+        self.cancel_capture()
+        field_info = field.field_info_for_system(self.ball_system)
+        kernel = kernels.KERNELS[self.kernel_name]
 
         # Another approach to optimization would be to try to reduce the number
         # of points that need calculation.  We could start with anything within
@@ -302,90 +307,65 @@ class AppWindow(pyglet.window.Window):
         # points with values above the cutoff, repeating until there are none
         # left uncomputed.  However, that approach likely wouldn't parallelize
         # well, as we'd have to pass lots of incremental state back and forth.
-        output = [None] * self.samples
-
-        futures = [
-            asyncio.get_event_loop().run_in_executor(
-                self.executor,
-                get_field_for_slice,
-                field_info,
+        incremental: Optional[mesh.IncrementalSurface] = None
+        if want_surface:
+            batch = pyglet.graphics.Batch()
+            self.surface_to_draw = batch
+            self.draw_surface = True
+            # Normals straight from the balls are smooth even on a coarse
+            # grid, where the sampled field's gradient shows every facet.
+            incremental = mesh.IncrementalSurface(
                 self.samples,
-                self.progress_queue,
-                i,
+                SURFACE_LEVEL,
+                self.surface_triangle_budget,
+                "analytic",
+                field_info,
+                kernel,
             )
-            for i in range(self.samples)
-        ]
-        await asyncio.wait(futures, return_when=asyncio.FIRST_EXCEPTION)
-        for i, future in enumerate(futures):
-            # Python 3.6 documents run_in_executor as returning awaitable *AND*
-            # as returning future.  It's returning future for me, but mypy
-            # thinks it's returning awaitable, and won't accept my attempts at
-            # appeasement.
-            output[i] = future.result()  # type: ignore
 
-        return np.array(output)
+        def on_slab(job: jobs.FieldJob, start: int, stop: int) -> None:
+            if incremental:
+                for piece in incremental.add_slices(job.field, start, stop):
+                    add_surface_piece(batch, piece)
+
+        job = jobs.FieldJob(
+            self.backend,
+            field_info,
+            self.samples,
+            on_slab,
+            kernel,
+        )
 
-    def capture_voxels(self, field: np.ndarray) -> VoxelList:
+        def on_finished(future):
+            if self.job is job:
+                self.job = None
+            if future.cancelled():
+                return
+            values = future.result()
+            if incremental and incremental.target_triangles is not None:
+                # Pieces went up at full resolution as they came in; now that
+                # the whole surface is here it gets decimated in one go.
+                whole = incremental.decimated()
+                decimated = pyglet.graphics.Batch()
+                if len(whole.triangles):
+                    add_surface_piece(decimated, whole)
+                if self.surface_to_draw is batch:
+                    self.surface_to_draw = decimated
+            if want_voxels:
+                self.voxels_to_draw = self.capture_voxels(values)
+
+        job.finished.add_done_callback(on_finished)
+        self.job = job
+
+    def capture_voxels(self, values: np.ndarray) -> VoxelList:
         self.draw_voxels = True
 
-        values_in_set = field > 0.6
-
-        samples_imaginary = self.samples * 1j
-        x_values, y_values, z_values = np.mgrid[
-            -1:1:samples_imaginary,  # type: ignore
-            -1:1:samples_imaginary,  # type: ignore
-            -1:1:samples_imaginary,  # type: ignore
-        ]
-        coords_list = []
-        for i in range(self.samples):
-            for j in range(self.samples):
-                for k in range(self.samples):
-                    if values_in_set[i][j][k]:
-                        x = x_values[i][j][k]
-                        y = y_values[i][j][k]
-                        z = z_values[i][j][k]
-                        coords_list.append((x, y, z))
-
-        # N samples means a range of [0...N-1], so a width of N-1 units.
-        v = VoxelList(coords_list, 1 / (self.samples - 1))
-        return v
-
-    def capture_surface(self, field: float):
-        self.draw_surface = True
-
-        vertices, triangles = mcubes.marching_cubes(field, 0.6)
-        surface_vertexes = tuple(
-            v * 2 / (self.samples - 1) - 1 for v in concat(vertices)
-        )
-        surface_vertex_count = len(surface_vertexes) // 3
-        # The indices appear to be ints, but when I pass them to add_indexed and
-        # they have math done on them [adding to another int], they turn into
-        # floats, which causes something expecting ints to blow up.  This
-        # explicit cast fixes that.
-        surface_indices = tuple(map(int, concat(triangles)))
-        surface_colors = tuple(surface_vertex_count * [64, 64, 192, 128])
-        batch = pyglet.graphics.Batch()
-        batch.add_indexed(
-            surface_vertex_count,
-            gl.GL_TRIANGLES,
-            None,
-            surface_indices,
-            ("v3f", surface_vertexes),
-            ("c4B", surface_colors),
-        )
-        return batch
+        values_in_set = values > SURFACE_LEVEL
+        return VoxelList(voxels.make_voxel_mesh(values_in_set))
 
     def draw_progress_bar(self) -> None:
-        try:
-            while True:
-                self.progress_queue.get_nowait()
-                # We can get these late; clear the queue anyway.
-                if self.job_in_progress:
-                    self.progress_count += 1
-        except queue.Empty:
-            pass
-        if self.progress_count:
-            progress_fraction = self.progress_count / self.samples
+        if self.job and self.job.completed:
+            progress_fraction = self.job.progress
             gl.glMatrixMode(gl.GL_PROJECTION)
             gl.glLoadIdentity()
             gl.gluOrtho2D(0, 1, 0, 1)
@@ -418,56 +398,158 @@ class AppWindow(pyglet.window.Window):
 
         gl.glMatrixMode(gl.GL_PROJECTION)
         gl.glLoadIdentity()
-        gl.gluPerspective(85, self.width / self.height, 0.1, 100)
+        gl.gluPerspective(
+            self.camera.field_of_view,
+            self.width / self.height,
+            self.camera.near,
+            100,
+        )
 
         gl.glMatrixMode(gl.GL_MODELVIEW)
         gl.glLoadIdentity()
-        gl.glTranslatef(0, 0, -2)
+        gl.glTranslatef(0, 0, -self.camera.distance)
 
         gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
         gl.glEnable(gl.GL_BLEND)
         gl.glEnable(gl.GL_DEPTH_TEST)
-        for shape in self.shapes:
-            shape.draw()
-
-        if self.draw_surface and self.surface_to_draw:
-            self.surface_to_draw.draw()
-        if self.draw_voxels and self.voxels_to_draw:
-            self.voxels_to_draw.draw()
-        self.draw_progress_bar()
+        with self.timings.measure("draw"):
+            for shape in self.shapes:
+                shape.draw()
+
+            if self.draw_surface and self.surface_to_draw:
+                self.draw_lit(self.surface_to_draw)
+            if self.draw_voxels and self.voxels_to_draw:
+                self.voxels_to_draw.draw()
+        with self.timings.measure("progress"):
+            self.draw_progress_bar()
+        if self.show_hud:
+            self.draw_hud()
+
+    def draw_lit(self, batch: pyglet.graphics.Batch) -> None:
+        """Draws something with normals under a light over the viewer's left
+        shoulder, taking the ambient and diffuse colors from its vertex
+        colors."""
+        gl.glPushMatrix()
+        # The light's position goes through the modelview matrix, so with
+        # that reset it's fixed relative to the eye.
+        gl.glLoadIdentity()
+        gl.glLightfv(
+            gl.GL_LIGHT0, gl.GL_POSITION, (gl.GLfloat * 4)(-1, 1, 1, 0)
+        )
+        gl.glPopMatrix()
+        gl.glLightModelfv(
+            gl.GL_LIGHT_MODEL_AMBIENT, (gl.GLfloat * 4)(0.4, 0.4, 0.4, 1)
+        )
+        gl.glColorMaterial(gl.GL_FRONT_AND_BACK, gl.GL_AMBIENT_AND_DIFFUSE)
+        gl.glEnable(gl.GL_COLOR_MATERIAL)
+        gl.glEnable(gl.GL_LIGHT0)
+        gl.glEnable(gl.GL_LIGHTING)
+        batch.draw()
+        gl.glDisable(gl.GL_LIGHTING)
+        gl.glDisable(gl.GL_LIGHT0)
+        gl.glDisable(gl.GL_COLOR_MATERIAL)
+
+    def update_hud(self, delta_t: float) -> None:
+        if self.show_hud:
+            self.hud.text = self.timings.summary()
+
+    def draw_hud(self) -> None:
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glLoadIdentity()
+        gl.gluOrtho2D(0, self.width, 0, self.height)
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glLoadIdentity()
+        gl.glDisable(gl.GL_DEPTH_TEST)
+        self.hud.y = self.height - 10
+        self.hud.draw()
 
     def on_resize(self, width: int, height: int) -> bool:
         gl.glViewport(0, 0, width, height)
+        self.camera.viewport_height = height
         return pyglet.event.EVENT_HANDLED
 
     def update(self, delta_t: float) -> None:
+        self.ball_system.update(delta_t / EXPECTED_FRAME_RATE)
         for shape in self.shapes:
             shape.update(delta_t / EXPECTED_FRAME_RATE)
 
 
-async def main():
-    # Leave 1 for the UI.  Hyperthreading isn't really good enough to
-    # eliminate jank--I have to leave a whole physical CPU free.
-    max_workers = max(psutil.cpu_count(logical=False) - 1, 1)
+async def main(args: argparse.Namespace):
     # Note that using the context manager here may not be ideal style; we could
-    # theoretically hold on to the executor reference in the AppWindow beyond
+    # theoretically hold on to the backend reference in the AppWindow beyond
     # the life of the context.
-    with ProcessPoolExecutor(max_workers=max_workers) as process_executor:
-        window = AppWindow(process_executor)
+    with backends.Backend(args.backend, args.workers, args.chunk) as backend:
+        app_window = AppWindow(
+            backend,
+            args.balls,
+            args.samples,
+            args.hud,
+            args.sphere,
+            args.instancing,
+            args.target_triangles,
+        )
+        timings = app_window.timings
+        loop = asyncio.get_event_loop()
+        next_frame = loop.time()
         # We can't use pyglet's standard main loop here, as both it and asyncio
         # want to own the event loop.  This replaces the pyglet main loop with
-        # one that does asyncio.sleep to yield to other asyncio threads, instead
-        # of whatever pyglet would normally do, which doesn't yield to asyncio.
+        # one that draws a frame, then sleeps in asyncio until the next one is
+        # due.  Field jobs finish, and their callbacks run, during that sleep,
+        # so nothing waits on us; we just don't burn a whole core spinning.
         while True:
-            pyglet.clock.tick()
+            with timings.measure("update"):
+                pyglet.clock.tick()
             for window in pyglet.app.windows:
                 window.switch_to()
-                window.dispatch_events()
+                with timings.measure("events"):
+                    window.dispatch_events()
                 window.dispatch_event("on_draw")
-                window.flip()
-            await asyncio.sleep(0)
+                with timings.measure("flip"):
+                    window.flip()
+            next_frame += EXPECTED_FRAME_RATE
+            delay = next_frame - loop.time()
+            if delay < 0:
+                # We've fallen behind; start pacing again from now rather than
+                # rushing out frames to catch up.
+                next_frame = loop.time()
+                delay = 0
+            with timings.measure("idle"):
+                await asyncio.sleep(delay)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Bounces metaballs around a box."
+    )
+    parser.add_argument("--balls", type=int, default=10)
+    parser.add_argument(
+        "--sphere",
+        choices=list(shapes.BASES),
+        default="icosahedron",
+        help="the shape that gets subdivided to make the balls",
+    )
+    parser.add_argument(
+        "--no-instancing",
+        dest="instancing",
+        action="store_false",
+        help="draw the balls one at a time instead of all in one go",
+    )
+    parser.add_argument(
+        "--hud", action="store_true", help="show per-phase frame timings"
+    )
+    parser.add_argument(
+        "--samples", type=int, default=30, help="grid points along each axis"
+    )
+    parser.add_argument(
+        "--target-triangles",
+        type=int,
+        default=None,
+        help="decimate captured surfaces to about this many triangles",
+    )
+    backends.add_arguments(parser)
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    loop.run_until_complete(main(parse_args()))
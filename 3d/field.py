@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+from typing import NamedTuple, Sequence, Tuple
+import numpy as np  # type: ignore
+
+from kernels import DEFAULT_KERNEL, Kernel
+
+# The field computation lives here, away from pyglet, so that it can run in
+# worker processes and in headless tools without dragging in a window.
+
+EPSILON = 0.001
+# Where the outlines get drawn.
+SURFACE_LEVEL = 0.6
+
+
+class BallFieldInfo(NamedTuple):
+    charge: float
+    size: float
+    coords: np.ndarray
+
+
+def field_info_for_system(system) -> Sequence[BallFieldInfo]:
+    """Snapshots a physics.BallSystem.  The coordinates are copied, since the
+    system keeps moving the balls while the field is computed."""
+    return [
+        BallFieldInfo(float(charge), float(size), np.array(coords))
+        for (charge, size, coords) in zip(
+            system.charges, system.sizes, system.positions
+        )
+    ]
+
+
+def get_field_for_point(
+    field_info: Sequence[BallFieldInfo], coords: np.ndarray
+) -> float:
+    strength = 0.0
+    for shape in field_info:
+        distance = np.linalg.norm(coords - shape.coords)
+        if distance < shape.size + EPSILON:
+            strength += shape.charge
+        else:
+            strength += shape.charge / ((1 + 4 * (distance - shape.size)) ** 3)
+    return strength
+
+
+def get_field_for_slice(
+    field_info: Sequence[BallFieldInfo], samples: int, progress_queue, i: int
+) -> float:
+    samples_imaginary = samples * 1j
+    x = i * 2 / (samples - 1) - 1
+    y_values, z_values = np.mgrid[
+        -1:1:samples_imaginary,  # type: ignore
+        -1:1:samples_imaginary,  # type: ignore
+    ]
+    output = np.zeros([samples, samples])
+    for j in range(samples):
+        for k in range(samples):
+            y = y_values[j][k]
+            z = z_values[j][k]
+            output[j][k] = get_field_for_point(field_info, np.array([x, y, z]))
+    if progress_queue is not None:
+        progress_queue.put(i)
+    return output
+
+
+def grid_axis(samples: int) -> np.ndarray:
+    """The sample coordinates along each axis, matching np.mgrid[-1:1:Nj]."""
+    return np.linspace(-1, 1, samples)
+
+
+def get_field_for_slab(
+    field_info: Sequence[BallFieldInfo],
+    samples: int,
+    slices: Tuple[int, int],
+    kernel: Kernel = DEFAULT_KERNEL,
+) -> np.ndarray:
+    """Computes x-slices [start, stop) of the field with NumPy.
+
+    With the default kernel this is the same falloff as get_field_for_point,
+    but evaluated for a whole block of points per ball, so the only Python
+    loop is over the balls.  The squared distance is built by broadcasting
+    the three axes against each other, which never materializes a coordinate
+    grid.
+
+    If the kernel has a cutoff, each ball only touches the grid points inside
+    its bounding box, and balls whose box misses the slab are skipped, so the
+    cost follows how crowded the slab is rather than how many balls there are.
+    """
+    start, stop = slices
+    axis = grid_axis(samples)
+    output = np.zeros([stop - start, samples, samples])
+    for shape in field_info:
+        bounds = [(start, stop), (0, samples), (0, samples)]
+        if kernel.cutoff is not None:
+            reach = shape.size + kernel.cutoff
+            for dimension, (low, high) in enumerate(bounds):
+                center = shape.coords[dimension]
+                bounds[dimension] = (
+                    max(low, int(np.searchsorted(axis, center - reach))),
+                    min(
+                        high,
+                        int(np.searchsorted(axis, center + reach, "right")),
+                    ),
+                )
+            if any(low >= high for (low, high) in bounds):
+                continue
+        (x_low, x_high), (y_low, y_high), (z_low, z_high) = bounds
+        c_x, c_y, c_z = shape.coords
+        distance = np.sqrt(
+            (axis[x_low:x_high, np.newaxis, np.newaxis] - c_x) ** 2
+            + (axis[np.newaxis, y_low:y_high, np.newaxis] - c_y) ** 2
+            + (axis[np.newaxis, np.newaxis, z_low:z_high] - c_z) ** 2
+        )
+        # Clamping only matters inside the ball, where np.where discards the
+        # falloff anyway; it keeps the kernels' inputs in their domain.
+        outside = np.maximum(distance - shape.size, 0)
+        output[
+            x_low - start : x_high - start, y_low:y_high, z_low:z_high
+        ] += shape.charge * np.where(
+            outside < EPSILON, 1, kernel.falloff(outside)
+        )
+    return output
+
+
+def get_field(
+    field_info: Sequence[BallFieldInfo],
+    samples: int,
+    slab_size: int = 16,
+    kernel: Kernel = DEFAULT_KERNEL,
+) -> np.ndarray:
+    """Computes the whole field in this process, a slab at a time to keep
+    temporaries small."""
+    return np.concatenate(
+        [
+            get_field_for_slab(
+                field_info,
+                samples,
+                (i, min(i + slab_size, samples)),
+                kernel,
+            )
+            for i in range(0, samples, slab_size)
+        ]
+    )
+
+
+def get_field_gradient(
+    field_info: Sequence[BallFieldInfo],
+    points: np.ndarray,
+    kernel: Kernel = DEFAULT_KERNEL,
+    batch_size: int = 1 << 20,
+) -> np.ndarray:
+    """Evaluates the gradient of the field at each of an (n, 3) array of
+    points, exactly, from the kernel's derivative.
+
+    This works on every point against every ball at once, a batch of points
+    at a time so that there are at most about batch_size point-ball pairs in
+    flight.  Inside a ball the field is flat, so the gradient is zero there.
+    """
+    centers = np.array([shape.coords for shape in field_info]).reshape(-1, 3)
+    sizes = np.array([shape.size for shape in field_info])
+    charges = np.array([shape.charge for shape in field_info])
+    gradient = np.zeros((len(points), 3))
+    step = max(1, batch_size // max(len(centers), 1))
+    for first in range(0, len(points), step):
+        chunk = points[first : first + step]
+        offsets = chunk[:, np.newaxis, :] - centers[np.newaxis, :, :]
+        distance = np.sqrt(np.einsum("pbi,pbi->pb", offsets, offsets))
+        outside = distance - sizes
+        slope = np.where(
+            outside < EPSILON, 0, kernel.derivative(np.maximum(outside, 0))
+        )
+        # Each ball adds charge * falloff'(t) * (point - center) / distance.
+        scale = charges * slope / np.maximum(distance, EPSILON)
+        gradient[first : first + step] = np.einsum(
+            "pb,pbi->pi", scale, offsets
+        )
+    return gradient
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Geometry that lives on the GPU, so drawing it doesn't mean handing every
+vertex back to OpenGL from Python each frame.
+
+The balls are all the same sphere at a handful of levels of detail, so each
+level is uploaded once, and each frame all the balls at a level go out in one
+instanced draw call, with each ball's center and size as per-instance
+attributes.  If the GL we get can't do that, SphereLists draws them one by one
+from retained vertex lists instead, which is slower but still doesn't copy any
+vertices per frame.
+"""
+
+from ctypes import POINTER, byref, c_char_p, cast, create_string_buffer
+from typing import List, NamedTuple, Union
+import warnings
+
+import numpy as np  # type: ignore
+import pyglet  # type: ignore
+from pyglet import gl
+
+import shapes
+
+# GLSL 1.20 runs on anything that can do instancing at all, including Mesa's
+# software renderer, and still gets the fixed-function matrices, so the
+# spheres go through the same transforms as everything else.
+VERTEX_SHADER = b"""
+#version 120
+attribute vec3 position;
+attribute vec4 color;
+// xyz is the ball's center, w its size.
+attribute vec4 instance;
+varying vec4 vertex_color;
+
+void main() {
+    vertex_color = color;
+    vec3 world = instance.xyz + instance.w * position;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(world, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = b"""
+#version 120
+varying vec4 vertex_color;
+
+void main() {
+    gl_FragColor = vertex_color;
+}
+"""
+
+POSITION, COLOR, INSTANCE = 0, 1, 2
+
+
+class ShaderError(Exception):
+    pass
+
+
+def fill_attribute(attribute_array, data: np.ndarray) -> None:
+    """Copies an array straight into a vertex list attribute's storage, rather
+    than letting ctypes walk it one element at a time.  Data with fewer
+    elements than the attribute, such as a single color, is repeated."""
+    destination = np.ctypeslib.as_array(attribute_array)
+    destination.reshape(-1, data.size)[:] = data.reshape(-1)
+
+
+def compile_shader(kind: int, source: bytes) -> int:
+    shader = gl.glCreateShader(kind)
+    text = c_char_p(source)
+    gl.glShaderSource(
+        shader, 1, cast(byref(text), POINTER(POINTER(gl.GLchar))), None
+    )
+    gl.glCompileShader(shader)
+    status = gl.GLint()
+    gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS, byref(status))
+    if not status.value:
+        log = create_string_buffer(4096)
+        gl.glGetShaderInfoLog(shader, len(log), None, log)
+        gl.glDeleteShader(shader)
+        raise ShaderError(log.value.decode(errors="replace"))
+    return shader
+
+
+def link_program(vertex_source: bytes, fragment_source: bytes) -> int:
+    shaders = [
+        compile_shader(gl.GL_VERTEX_SHADER, vertex_source),
+        compile_shader(gl.GL_FRAGMENT_SHADER, fragment_source),
+    ]
+    program = gl.glCreateProgram()
+    for shader in shaders:
+        gl.glAttachShader(program, shader)
+    for location, name in [
+        (POSITION, b"position"),
+        (COLOR, b"color"),
+        (INSTANCE, b"instance"),
+    ]:
+        gl.glBindAttribLocation(program, location, name)
+    gl.glLinkProgram(program)
+    for shader in shaders:
+        gl.glDeleteShader(shader)
+    status = gl.GLint()
+    gl.glGetProgramiv(program, gl.GL_LINK_STATUS, byref(status))
+    if not status.value:
+        log = create_string_buffer(4096)
+        gl.glGetProgramInfoLog(program, len(log), None, log)
+        gl.glDeleteProgram(program)
+        raise ShaderError(log.value.decode(errors="replace"))
+    return program
+
+
+def make_buffer(target: int, data: np.ndarray) -> int:
+    buffer = gl.GLuint()
+    gl.glGenBuffers(1, byref(buffer))
+    gl.glBindBuffer(target, buffer)
+    gl.glBufferData(target, data.nbytes, data.ctypes.data, gl.GL_STATIC_DRAW)
+    gl.glBindBuffer(target, 0)
+    return buffer.value
+
+
+class LevelBuffers(NamedTuple):
+    vertices: int
+    colors: int
+    indices: int
+    index_count: int
+
+
+def instancing_supported() -> bool:
+    return gl.gl_info.have_version(3, 3)
+
+
+class InstancedSpheres:
+    """Every level of a SphereLOD in its own static buffers, drawn with one
+    glDrawElementsInstanced call per level in use."""
+
+    def __init__(self, lod: shapes.SphereLOD):
+        self.program = link_program(VERTEX_SHADER, FRAGMENT_SHADER)
+        self.levels = [
+            LevelBuffers(
+                make_buffer(
+                    gl.GL_ARRAY_BUFFER,
+                    np.ascontiguousarray(geometry.points, np.float32),
+                ),
+                make_buffer(
+                    gl.GL_ARRAY_BUFFER,
+                    np.ascontiguousarray(geometry.colors, np.uint8),
+                ),
+                make_buffer(
+                    gl.GL_ELEMENT_ARRAY_BUFFER,
+                    np.ascontiguousarray(geometry.faces, np.uint32),
+                ),
+                geometry.faces.size,
+            )
+            for geometry in lod.levels
+        ]
+        self.instance_buffer = gl.GLuint()
+        gl.glGenBuffers(1, byref(self.instance_buffer))
+
+    def draw(
+        self, positions: np.ndarray, sizes: np.ndarray, levels: np.ndarray
+    ) -> None:
+        instances = np.empty((len(positions), 4), dtype=np.float32)
+        instances[:, :3] = positions
+        instances[:, 3] = sizes
+        gl.glUseProgram(self.program)
+        for location in [POSITION, COLOR, INSTANCE]:
+            gl.glEnableVertexAttribArray(location)
+        gl.glVertexAttribDivisor(INSTANCE, 1)
+        for level in np.unique(levels):
+            chosen = np.ascontiguousarray(instances[levels == level])
+            buffers = self.levels[level]
+            # The instance data changes every frame, so it gets streamed
+            # into its own buffer; everything else is already there.
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.instance_buffer)
+            gl.glBufferData(
+                gl.GL_ARRAY_BUFFER,
+                chosen.nbytes,
+                chosen.ctypes.data,
+                gl.GL_STREAM_DRAW,
+            )
+            gl.glVertexAttribPointer(INSTANCE, 4, gl.GL_FLOAT, False, 0, None)
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffers.vertices)
+            gl.glVertexAttribPointer(POSITION, 3, gl.GL_FLOAT, False, 0, None)
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffers.colors)
+            gl.glVertexAttribPointer(
+                COLOR, 4, gl.GL_UNSIGNED_BYTE, True, 0, None
+            )
+            gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, buffers.indices)
+            gl.glDrawElementsInstanced(
+                gl.GL_TRIANGLES,
+                buffers.index_count,
+                gl.GL_UNSIGNED_INT,
+                None,
+                len(chosen),
+            )
+        # Put things back the way pyglet expects to find them.
+        gl.glVertexAttribDivisor(INSTANCE, 0)
+        for location in [POSITION, COLOR, INSTANCE]:
+            gl.glDisableVertexAttribArray(location)
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, 0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        gl.glUseProgram(0)
+
+
+class SphereLists:
+    """The fallback: a retained vertex list per level, and a draw call per
+    ball."""
+
+    def __init__(self, lod: shapes.SphereLOD):
+        self.levels: List[pyglet.graphics.vertexdomain.IndexedVertexList] = []
+        for geometry in lod.levels:
+            vertex_list = pyglet.graphics.vertex_list_indexed(
+                len(geometry.points),
+                geometry.faces.reshape(-1).tolist(),
+                "v3f",
+                "c4B",
+            )
+            fill_attribute(vertex_list.vertices, geometry.points)
+            fill_attribute(vertex_list.colors, geometry.colors)
+            self.levels.append(vertex_list)
+
+    def draw(
+        self, positions: np.ndarray, sizes: np.ndarray, levels: np.ndarray
+    ) -> None:
+        for coords, size, level in zip(positions, sizes, levels):
+            gl.glPushMatrix()
+            gl.glTranslatef(coords[0], coords[1], coords[2])
+            gl.glScalef(size, size, size)
+            self.levels[level].draw(gl.GL_TRIANGLES)
+            gl.glPopMatrix()
+
+
+def make_sphere_renderer(
+    lod: shapes.SphereLOD, instanced: bool = True
+) -> Union[InstancedSpheres, SphereLists]:
+    if instanced and instancing_supported():
+        try:
+            return InstancedSpheres(lod)
+        except ShaderError as error:
+            warnings.warn(f"Not instancing the balls: {error}")
+    return SphereLists(lod)
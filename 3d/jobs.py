@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+from functools import partial
+from typing import Callable, List, Optional, Sequence
+import asyncio
+
+import numpy as np  # type: ignore
+
+from backends import Backend, timed_field_for_slab
+from field import BallFieldInfo
+from kernels import DEFAULT_KERNEL, Kernel
+
+
+class FieldJob:
+    """One field computation, submitted to a backend a slab of x-slices at a
+    time.
+
+    Slabs are handed to on_slab as soon as they arrive, in whatever order
+    they finish, so callers can show partial results.  Once every slice is in,
+    the finished future resolves to the whole field.  Cancelling drops every
+    slab that hasn't started yet and ignores the ones that are still running.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        field_info: Sequence[BallFieldInfo],
+        samples: int,
+        on_slab: Optional[Callable[["FieldJob", int, int], None]] = None,
+        kernel: Kernel = DEFAULT_KERNEL,
+    ):
+        self.samples = samples
+        self.field = np.zeros([samples, samples, samples])
+        self.completed = 0
+        self.cancelled = False
+        self.on_slab = on_slab
+        self.backend = backend
+        loop = asyncio.get_event_loop()
+        self.finished: asyncio.Future = loop.create_future()
+        self.futures: List[asyncio.Future] = []
+        slab_size = backend.slab_size(samples)
+        for start in range(0, samples, slab_size):
+            stop = min(start + slab_size, samples)
+            future = loop.run_in_executor(
+                backend.executor,
+                timed_field_for_slab,
+                field_info,
+                samples,
+                (start, stop),
+                kernel,
+            )
+            future.add_done_callback(partial(self._slab_done, start, stop))
+            self.futures.append(future)
+
+    @property
+    def progress(self) -> float:
+        return self.completed / self.samples
+
+    def cancel(self) -> None:
+        if self.cancelled or self.finished.done():
+            return
+        self.cancelled = True
+        # Cancelling the asyncio wrappers cancels the underlying executor
+        # futures too, which only works on ones that haven't started.
+        for future in self.futures:
+            future.cancel()
+        self.finished.cancel()
+
+    def _slab_done(self, start: int, stop: int, future: asyncio.Future):
+        if self.cancelled or future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._fail(error)
+            return
+        output, seconds = future.result()
+        self.backend.record(output.size, seconds)
+        self.field[start:stop] = output
+        self.completed += stop - start
+        if self.on_slab:
+            self.on_slab(self, start, stop)
+        if self.completed == self.samples:
+            self.finished.set_result(self.field)
+
+    def _fail(self, error: BaseException) -> None:
+        if not self.finished.done():
+            self.finished.set_exception(error)
+        self.cancelled = True
+        for future in self.futures:
+            future.cancel()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+from typing import Dict, Optional
+import numpy as np  # type: ignore
+
+# A kernel describes how one ball's field falls off with distance.  Every
+# kernel is a function of t, the distance past the ball's surface, and is 1 at
+# t = 0; the field engine scales it by the ball's charge.  Kernels with a
+# cutoff are exactly zero for t >= cutoff, which lets the engine skip every
+# grid point that's out of a ball's reach.  Kernels also know their
+# derivative, which gives the field's gradient, and so surface normals,
+# exactly.
+
+# Balls stay inside the box, so no grid point can be further than this from
+# any of them.
+BOX_DIAGONAL = 2 * np.sqrt(3)
+
+
+class Kernel:
+    cutoff: Optional[float] = None
+
+    def falloff(self, t: np.ndarray) -> np.ndarray:
+        """t is >= 0.  Returns the kernel's value at each t."""
+        raise NotImplementedError()
+
+    def derivative(self, t: np.ndarray) -> np.ndarray:
+        """t is >= 0.  Returns d(falloff)/dt at each t."""
+        raise NotImplementedError()
+
+
+class InverseCube(Kernel):
+    """The original falloff, 1 / (1 + 4t)^3.  It never reaches zero, so every
+    ball touches every grid point."""
+
+    def falloff(self, t: np.ndarray) -> np.ndarray:
+        return 1 / (1 + 4 * t) ** 3
+
+    def derivative(self, t: np.ndarray) -> np.ndarray:
+        return -12 / (1 + 4 * t) ** 4
+
+
+class Wyvill(Kernel):
+    """The Wyvills' soft-object polynomial: smooth, with zero value and slope
+    at the cutoff, and cheap, since it only needs r^2."""
+
+    def __init__(self, cutoff: float):
+        self.cutoff = cutoff
+
+    def falloff(self, t: np.ndarray) -> np.ndarray:
+        r_2 = np.minimum(t / self.cutoff, 1) ** 2
+        r_4 = r_2 * r_2
+        return 1 + (-22 / 9) * r_2 + (17 / 9) * r_4 + (-4 / 9) * r_4 * r_2
+
+    def derivative(self, t: np.ndarray) -> np.ndarray:
+        # This is already 0 at r = 1, so clamping takes care of t > cutoff.
+        r = np.minimum(t / self.cutoff, 1)
+        r_2 = r * r
+        return (
+            r * ((-44 / 9) + (68 / 9) * r_2 + (-24 / 9) * r_2 * r_2)
+        ) / self.cutoff
+
+
+class Polynomial(Kernel):
+    """(1 - (t / cutoff)^2)^exponent.  Higher exponents fall off faster."""
+
+    def __init__(self, cutoff: float, exponent: int = 3):
+        self.cutoff = cutoff
+        self.exponent = exponent
+
+    def falloff(self, t: np.ndarray) -> np.ndarray:
+        r = np.minimum(t / self.cutoff, 1)
+        return (1 - r * r) ** self.exponent
+
+    def derivative(self, t: np.ndarray) -> np.ndarray:
+        r = np.minimum(t / self.cutoff, 1)
+        slope = (
+            -2 * self.exponent * r * (1 - r * r) ** (self.exponent - 1)
+        ) / self.cutoff
+        # With an exponent of 1 the slope doesn't reach 0 at the cutoff.
+        return np.where(t < self.cutoff, slope, 0)
+
+
+class Tabulated(Kernel):
+    """Wraps a costly kernel in a lookup table, sampled evenly over [0, reach]
+    and linearly interpolated.  reach is the kernel's cutoff if it has one;
+    otherwise it's the furthest any grid point can be from a ball."""
+
+    def __init__(self, kernel: Kernel, resolution: int = 4096):
+        self.kernel = kernel
+        self.cutoff = kernel.cutoff
+        self.reach = kernel.cutoff if kernel.cutoff else BOX_DIAGONAL
+        self.scale = (resolution - 1) / self.reach
+        t = np.linspace(0, self.reach, resolution)
+        self.table = kernel.falloff(t)
+        # The slope of the interpolated falloff is a step function, which
+        # shows up as banding in the shading; a table of its own is smoother.
+        self.derivative_table = kernel.derivative(t)
+
+    def falloff(self, t: np.ndarray) -> np.ndarray:
+        return self.look_up(self.table, t)
+
+    def derivative(self, t: np.ndarray) -> np.ndarray:
+        return self.look_up(self.derivative_table, t)
+
+    def look_up(self, table: np.ndarray, t: np.ndarray) -> np.ndarray:
+        position = np.minimum(t * self.scale, len(table) - 1)
+        index = np.minimum(position.astype(np.intp), len(table) - 2)
+        fraction = position - index
+        return table[index] + fraction * (table[index + 1] - table[index])
+
+
+KERNELS: Dict[str, Kernel] = {
+    "inverse-cube": InverseCube(),
+    "wyvill": Wyvill(0.3),
+    "polynomial": Polynomial(0.3, 3),
+    "tabulated-inverse-cube": Tabulated(InverseCube()),
+}
+DEFAULT_KERNEL = KERNELS["inverse-cube"]
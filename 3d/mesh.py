@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+from typing import List, NamedTuple, Optional, Sequence
+import numpy as np  # type: ignore
+
+# mcubes requires scipy
+import mcubes  # type: ignore
+
+from field import BallFieldInfo, get_field_gradient
+from kernels import DEFAULT_KERNEL, Kernel
+
+# Everything in here stays in NumPy arrays from marching cubes right up to the
+# point where pyglet copies the data out, so that big surfaces don't spend all
+# their time being turned into tuples.
+
+
+class Mesh(NamedTuple):
+    """Triangle mesh in world coordinates.
+
+    vertices and normals are (V, 3) float32; triangles is (T, 3) int32.
+    """
+
+    vertices: np.ndarray
+    normals: np.ndarray
+    triangles: np.ndarray
+
+
+def grid_to_world(vertices: np.ndarray, samples: int) -> np.ndarray:
+    """Rescales grid-index coordinates to [-1, 1] in place, and returns the
+    same array for convenience."""
+    vertices *= 2 / (samples - 1)
+    vertices -= 1
+    return vertices
+
+
+def world_to_grid(vertices: np.ndarray, samples: int) -> np.ndarray:
+    return (vertices + 1) * ((samples - 1) / 2)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Leave zero-length vectors alone rather than filling them with NaNs.
+    lengths[lengths < 1e-12] = 1
+    vectors /= lengths
+    return vectors
+
+
+def face_normals(vertices: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    """Returns unnormalized face normals, whose lengths are twice the areas
+    of their triangles."""
+    v0 = vertices[triangles[:, 0]]
+    v1 = vertices[triangles[:, 1]]
+    v2 = vertices[triangles[:, 2]]
+    return np.cross(v1 - v0, v2 - v0)
+
+
+def normals_from_faces(
+    vertices: np.ndarray, triangles: np.ndarray
+) -> np.ndarray:
+    """Area-weighted average of the normals of the faces around each vertex."""
+    per_face = face_normals(vertices, triangles)
+    normals = np.zeros((len(vertices), 3))
+    for corner in range(3):
+        for axis in range(3):
+            normals[:, axis] += np.bincount(
+                triangles[:, corner],
+                weights=per_face[:, axis],
+                minlength=len(vertices),
+            )
+    return normalize_rows(normals).astype(np.float32)
+
+
+def normals_from_sampled_field(
+    volume: np.ndarray, grid_vertices: np.ndarray
+) -> np.ndarray:
+    """Trilinearly interpolates the gradient of a sampled volume at each
+    vertex.  The vertices are in the volume's own index coordinates.
+
+    The field is strongest inside the surface, so the outward normal points
+    down the gradient.
+    """
+    gradient = np.stack(np.gradient(volume), axis=-1)
+    base = np.clip(
+        np.floor(grid_vertices).astype(np.int64),
+        0,
+        np.array(volume.shape) - 2,
+    )
+    fraction = grid_vertices - base
+    normals = np.zeros((len(grid_vertices), 3))
+    for corner in range(8):
+        offset = np.array([(corner >> 2) & 1, (corner >> 1) & 1, corner & 1])
+        weight = np.prod(
+            np.where(offset, fraction, 1 - fraction), axis=1, keepdims=True
+        )
+        index = base + offset
+        normals += weight * gradient[index[:, 0], index[:, 1], index[:, 2]]
+    return normalize_rows(-normals).astype(np.float32)
+
+
+def normals_from_field_gradient(
+    field_info: Sequence[BallFieldInfo],
+    vertices: np.ndarray,
+    kernel: Kernel = DEFAULT_KERNEL,
+) -> np.ndarray:
+    """The exact field gradient at each vertex, in world coordinates, from
+    the balls themselves rather than the samples.  It costs a pass over the
+    balls per vertex, but it's smooth however coarse the grid is."""
+    gradient = get_field_gradient(field_info, vertices, kernel)
+    return normalize_rows(-gradient).astype(np.float32)
+
+
+def decimate(mesh: Mesh, target_triangles: int) -> Mesh:
+    """Reduces the mesh to roughly target_triangles triangles by vertex
+    clustering.
+
+    Vertices are snapped to a uniform grid and each occupied cell collapses to
+    the mean of its vertices; triangles that collapse to a point or a line are
+    dropped.  The cell size is found by bisection on the triangle count.  This
+    is cruder than edge-collapse decimation, but it's a handful of array
+    passes rather than a priority queue in Python.
+    """
+    if len(mesh.triangles) <= target_triangles:
+        return mesh
+    low, high = 1e-4, 2.0
+    best = mesh
+    for _ in range(16):
+        cell_size = (low + high) / 2
+        candidate = cluster_vertices(mesh, cell_size)
+        if len(candidate.triangles) > target_triangles:
+            low = cell_size
+        else:
+            high = cell_size
+            best = candidate
+    return best
+
+
+def concatenate(meshes: Sequence[Mesh]) -> Mesh:
+    """Puts meshes together into one.  Vertices that pieces share along
+    their boundaries stay duplicated; decimating merges them."""
+    offsets = np.cumsum([0] + [len(piece.vertices) for piece in meshes])
+    return Mesh(
+        np.concatenate(
+            [piece.vertices for piece in meshes] + [np.zeros((0, 3))]
+        ).astype(np.float32),
+        np.concatenate(
+            [piece.normals for piece in meshes] + [np.zeros((0, 3))]
+        ).astype(np.float32),
+        np.concatenate(
+            [
+                piece.triangles + offset
+                for piece, offset in zip(meshes, offsets)
+            ]
+            + [np.zeros((0, 3), dtype=np.int32)]
+        ).astype(np.int32),
+    )
+
+
+def cluster_vertices(mesh: Mesh, cell_size: float) -> Mesh:
+    cells = np.floor(mesh.vertices / cell_size).astype(np.int64)
+    _, cluster, counts = np.unique(
+        cells, axis=0, return_inverse=True, return_counts=True
+    )
+    cluster = cluster.reshape(-1)
+    vertices = np.zeros((len(counts), 3))
+    normals = np.zeros((len(counts), 3))
+    for axis in range(3):
+        vertices[:, axis] = np.bincount(
+            cluster, weights=mesh.vertices[:, axis], minlength=len(counts)
+        )
+        normals[:, axis] = np.bincount(
+            cluster, weights=mesh.normals[:, axis], minlength=len(counts)
+        )
+    vertices /= counts[:, np.newaxis]
+
+    triangles = cluster[mesh.triangles]
+    keep = (
+        (triangles[:, 0] != triangles[:, 1])
+        & (triangles[:, 1] != triangles[:, 2])
+        & (triangles[:, 0] != triangles[:, 2])
+    )
+    triangles = triangles[keep]
+    # Two triangles can land on the same three clusters; keep one of them.
+    ordered = np.sort(triangles, axis=1)
+    _, first = np.unique(ordered, axis=0, return_index=True)
+    triangles = triangles[np.sort(first)]
+    return Mesh(
+        vertices.astype(np.float32),
+        normalize_rows(normals).astype(np.float32),
+        triangles.astype(np.int32),
+    )
+
+
+def mesh_from_slab(
+    slab: np.ndarray,
+    first_slice: int,
+    samples: int,
+    level: float,
+    normal_source: str = "field",
+    field_info: Optional[Sequence[BallFieldInfo]] = None,
+    kernel: Kernel = DEFAULT_KERNEL,
+) -> Mesh:
+    """Runs marching cubes over x-slices [first_slice, first_slice + len(slab))
+    of a field sampled samples times along each axis of [-1, 1]^3, and returns
+    that piece of the surface in world coordinates.
+
+    Neighboring slabs that share their boundary slice produce matching edges
+    there, so pieces can be meshed separately and drawn together.
+
+    normal_source is "field" to take normals from the gradient of the sampled
+    field, "faces" to average the normals of the surrounding triangles, or
+    "analytic" to evaluate the gradient exactly from field_info and kernel,
+    which must be what the field was sampled from.
+    """
+    grid_vertices, triangles = mcubes.marching_cubes(slab, level)
+    # mcubes hands back float indices; anything that does arithmetic on them
+    # later expects ints.
+    triangles = triangles.astype(np.int32)
+    if normal_source == "field":
+        normals = normals_from_sampled_field(slab, grid_vertices)
+    elif normal_source == "analytic":
+        if field_info is None:
+            raise ValueError("Analytic normals need the field_info")
+    elif normal_source != "faces":
+        raise ValueError(f"Unknown normal source {normal_source!r}")
+    vertices = grid_vertices.astype(np.float32)
+    vertices[:, 0] += first_slice
+    grid_to_world(vertices, samples)
+    if normal_source == "faces":
+        normals = normals_from_faces(vertices, triangles)
+    elif normal_source == "analytic":
+        normals = normals_from_field_gradient(field_info, vertices, kernel)
+    return Mesh(vertices, normals, triangles)
+
+
+def mesh_from_field(
+    field: np.ndarray,
+    level: float,
+    target_triangles: Optional[int] = None,
+    normal_source: str = "field",
+    field_info: Optional[Sequence[BallFieldInfo]] = None,
+    kernel: Kernel = DEFAULT_KERNEL,
+) -> Mesh:
+    """Meshes a whole field sampled on [-1, 1]^3; see mesh_from_slab."""
+    mesh = mesh_from_slab(
+        field,
+        0,
+        field.shape[0],
+        level,
+        normal_source,
+        field_info,
+        kernel,
+    )
+    if target_triangles is not None:
+        mesh = decimate(mesh, target_triangles)
+    return mesh
+
+
+class IncrementalSurface:
+    """Meshes a field as its x-slices arrive, in any order.
+
+    Each layer of cells between two adjacent slices gets meshed as soon as
+    both of its slices are in, with runs of ready layers meshed together.
+
+    Pieces come out at full resolution.  With a triangle budget, decimated()
+    gives the whole surface decimated in one go once it's done.  Decimating
+    each piece against its share of the budget would pick cluster cells far
+    thicker than the piece, and most of it would collapse away.
+    """
+
+    def __init__(
+        self,
+        samples: int,
+        level: float,
+        target_triangles: Optional[int] = None,
+        normal_source: str = "field",
+        field_info: Optional[Sequence[BallFieldInfo]] = None,
+        kernel: Kernel = DEFAULT_KERNEL,
+    ):
+        self.samples = samples
+        self.level = level
+        self.target_triangles = target_triangles
+        self.normal_source = normal_source
+        self.field_info = field_info
+        self.kernel = kernel
+        self.slice_ready = np.zeros(samples, dtype=bool)
+        self.layer_meshed = np.zeros(samples - 1, dtype=bool)
+        self.pieces: List[Mesh] = []
+
+    def add_slices(
+        self, field: np.ndarray, start: int, stop: int
+    ) -> List[Mesh]:
+        """Records that field[start:stop] is now valid, and returns meshes
+        for any layers of cells that became complete."""
+        self.slice_ready[start:stop] = True
+        ready = (
+            self.slice_ready[:-1] & self.slice_ready[1:] & ~self.layer_meshed
+        )
+        padded = np.concatenate([[False], ready, [False]]).astype(np.int8)
+        edges = np.diff(padded)
+        meshes = []
+        for first, last in zip(
+            np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        ):
+            self.layer_meshed[first:last] = True
+            piece = mesh_from_slab(
+                field[first : last + 1],
+                first,
+                self.samples,
+                self.level,
+                self.normal_source,
+                self.field_info,
+                self.kernel,
+            )
+            if len(piece.triangles):
+                meshes.append(piece)
+        if self.target_triangles is not None:
+            self.pieces.extend(meshes)
+        return meshes
+
+    @property
+    def done(self) -> bool:
+        return bool(self.layer_meshed.all())
+
+    def decimated(self) -> Mesh:
+        """The whole surface, decimated to the triangle budget.  Only call
+        this once it's done, and only with a budget."""
+        assert self.target_triangles is not None and self.done
+        return decimate(concatenate(self.pieces), self.target_triangles)
+
+
+def write_npz(mesh: Mesh, path: str) -> None:
+    np.savez(
+        path,
+        vertices=mesh.vertices,
+        normals=mesh.normals,
+        triangles=mesh.triangles,
+    )
+
+
+def write_ply(mesh: Mesh, path: str) -> None:
+    """Binary little-endian PLY with per-vertex normals."""
+    vertex_data = np.empty(
+        len(mesh.vertices),
+        dtype=[
+            ("x", "<f4"),
+            ("y", "<f4"),
+            ("z", "<f4"),
+            ("nx", "<f4"),
+            ("ny", "<f4"),
+            ("nz", "<f4"),
+        ],
+    )
+    for index, name in enumerate("xyz"):
+        vertex_data[name] = mesh.vertices[:, index]
+        vertex_data["n" + name] = mesh.normals[:, index]
+    face_data = np.empty(
+        len(mesh.triangles), dtype=[("count", "u1"), ("indices", "<i4", 3)]
+    )
+    face_data["count"] = 3
+    face_data["indices"] = mesh.triangles
+    header = "\n".join(
+        [
+            "ply",
+            "format binary_little_endian 1.0",
+            f"element vertex {len(mesh.vertices)}",
+            "property float x",
+            "property float y",
+            "property float z",
+            "property float nx",
+            "property float ny",
+            "property float nz",
+            f"element face {len(mesh.triangles)}",
+            "property list uchar int vertex_indices",
+            "end_header",
+            "",
+        ]
+    )
+    with open(path, "wb") as output:
+        output.write(header.encode("ascii"))
+        output.write(vertex_data.tobytes())
+        output.write(face_data.tobytes())
+
+
+def write_stl(mesh: Mesh, path: str) -> None:
+    """Binary STL.  STL has no shared vertices or vertex normals, so each
+    triangle carries its own corners and face normal."""
+    triangle_data = np.zeros(
+        len(mesh.triangles),
+        dtype=[
+            ("normal", "<f4", 3),
+            ("corners", "<f4", (3, 3)),
+            ("attributes", "<u2"),
+        ],
+    )
+    triangle_data["normal"] = normalize_rows(
+        face_normals(mesh.vertices, mesh.triangles).astype(np.float64)
+    )
+    triangle_data["corners"] = mesh.vertices[mesh.triangles]
+    with open(path, "wb") as output:
+        output.write(b"metaball surface".ljust(80, b"\0"))
+        output.write(np.uint32(len(mesh.triangles)).tobytes())
+        output.write(triangle_data.tobytes())
+
+
+WRITERS = {"npz": write_npz, "ply": write_ply, "stl": write_stl}
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Renders a metaball sequence to disk without opening a window.
+
+This steps the ball physics for a number of frames and writes each frame's
+isosurface to its own file.  The work is pipelined: while the physics steps
+ahead to a new frame, the fields for the frames before it are computed in a
+worker pool, a slab of slices per task, and finished fields are meshed and
+written in a background thread.  At most --in-flight frames are between
+physics and disk at once, which bounds memory.
+
+    ./offline.py --frames 300 --samples 96 --balls 20 --format ply out/
+"""
+
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Deque, List, Optional, Sequence
+import argparse
+import os
+import time
+
+import numpy as np  # type: ignore
+
+import backends
+import field
+import kernels
+import mesh
+import physics
+
+
+class Frame:
+    """One frame on its way through the pipeline."""
+
+    def __init__(
+        self,
+        index: int,
+        field_info: Sequence[field.BallFieldInfo],
+        slabs: List[Future],
+        started: float,
+    ):
+        self.index = index
+        self.field_info = field_info
+        self.slabs = slabs
+        self.started = started
+        self.written: Optional[Future] = None
+
+    def field_ready(self) -> bool:
+        return all(slab.done() for slab in self.slabs)
+
+    def outstanding(self) -> List[Future]:
+        if self.written is not None:
+            return [self.written]
+        return [slab for slab in self.slabs if not slab.done()]
+
+
+def mesh_and_write(
+    samples_field: np.ndarray,
+    path: str,
+    writer,
+    target_triangles: Optional[int],
+    normal_source: str,
+    field_info: Sequence[field.BallFieldInfo],
+    kernel: kernels.Kernel,
+) -> int:
+    surface = mesh.mesh_from_field(
+        samples_field,
+        field.SURFACE_LEVEL,
+        target_triangles,
+        normal_source,
+        field_info,
+        kernel,
+    )
+    writer(surface, path)
+    return len(surface.triangles)
+
+
+def submit_field(
+    backend: backends.Backend,
+    field_info: Sequence[field.BallFieldInfo],
+    samples: int,
+    kernel: kernels.Kernel,
+) -> List[Future]:
+    chunk = backend.slab_size(samples)
+    return [
+        backend.executor.submit(
+            backends.timed_field_for_slab,
+            field_info,
+            samples,
+            (i, min(i + chunk, samples)),
+            kernel,
+        )
+        for i in range(0, samples, chunk)
+    ]
+
+
+def run(args: argparse.Namespace) -> None:
+    os.makedirs(args.output_dir, exist_ok=True)
+    rng = np.random.default_rng(args.seed)
+    system = physics.initial_system(args.balls, rng)
+    system.collisions = args.collisions
+    kernel = kernels.KERNELS[args.kernel]
+    writer = mesh.WRITERS[args.format]
+
+    in_flight: Deque[Frame] = deque()
+    next_frame = 0
+    start = time.perf_counter()
+    with backends.Backend(
+        args.backend, args.workers, args.chunk
+    ) as backend, ThreadPoolExecutor(args.mesh_threads) as mesh_pool:
+        while next_frame < args.frames or in_flight:
+            # Physics runs ahead as far as the in-flight limit allows.
+            while next_frame < args.frames and len(in_flight) < args.in_flight:
+                field_info = field.field_info_for_system(system)
+                slabs = submit_field(backend, field_info, args.samples, kernel)
+                in_flight.append(
+                    Frame(next_frame, field_info, slabs, time.perf_counter())
+                )
+                next_frame += 1
+                for _ in range(args.steps_per_frame):
+                    system.update(1)
+
+            # Fields that are all in go on to be meshed.
+            for frame in in_flight:
+                if frame.written is None and frame.field_ready():
+                    outputs = []
+                    for slab in frame.slabs:
+                        output, seconds = slab.result()
+                        backend.record(output.size, seconds)
+                        outputs.append(output)
+                    samples_field = np.concatenate(outputs)
+                    frame.slabs = []
+                    path = os.path.join(
+                        args.output_dir,
+                        f"frame_{frame.index:05d}.{args.format}",
+                    )
+                    frame.written = mesh_pool.submit(
+                        mesh_and_write,
+                        samples_field,
+                        path,
+                        writer,
+                        args.target_triangles,
+                        args.normals,
+                        frame.field_info,
+                        kernel,
+                    )
+
+            # Frames retire in order, so a slow frame holds back the rest and
+            # the physics with them; that's what keeps memory bounded.
+            while (
+                in_flight
+                and in_flight[0].written is not None
+                and in_flight[0].written.done()
+            ):
+                frame = in_flight.popleft()
+                triangles = frame.written.result()
+                print(
+                    f"frame {frame.index}: {triangles} triangles, "
+                    f"{time.perf_counter() - frame.started:.2f}s in flight"
+                )
+
+            outstanding = [
+                future for frame in in_flight for future in frame.outstanding()
+            ]
+            if outstanding:
+                wait(outstanding, return_when=FIRST_COMPLETED)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.frames} frames in {elapsed:.2f}s "
+        f"({args.frames / elapsed:.2f} frames/s)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("output_dir")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--balls", type=int, default=10)
+    parser.add_argument(
+        "--steps-per-frame",
+        type=int,
+        default=1,
+        help="physics steps between written frames",
+    )
+    parser.add_argument(
+        "--kernel", choices=list(kernels.KERNELS), default="inverse-cube"
+    )
+    parser.add_argument("--format", choices=list(mesh.WRITERS), default="npz")
+    parser.add_argument("--target-triangles", type=int, default=None)
+    parser.add_argument(
+        "--normals",
+        choices=["analytic", "field", "faces"],
+        default="analytic",
+        help="where vertex normals come from; see mesh.mesh_from_slab",
+    )
+    parser.add_argument(
+        "--no-collisions", dest="collisions", action="store_false"
+    )
+    backends.add_arguments(parser)
+    parser.add_argument("--mesh-threads", type=int, default=1)
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        default=3,
+        help="frames between physics and disk at once",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+from itertools import product
+from typing import Optional, Tuple
+import numpy as np  # type: ignore
+
+WALL_BUFFER = 0.15
+EXPECTED_FRAME_RATE = 1 / 65.0
+# Per expected frame.
+DEFAULT_SPEED = 0.5 * EXPECTED_FRAME_RATE
+
+
+class BallSystem:
+    """Holds the state of every ball as parallel arrays, so that a physics
+    step is a few array operations no matter how many balls there are.
+
+    positions and velocities are (N, 3); sizes and charges are (N,).
+    Velocities are in units per expected frame.
+    """
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        velocities: np.ndarray,
+        sizes: np.ndarray,
+        charges: np.ndarray,
+    ):
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.velocities = np.asarray(velocities, dtype=np.float64)
+        self.sizes = np.asarray(sizes, dtype=np.float64)
+        self.charges = np.asarray(charges, dtype=np.float64)
+        self.collisions = True
+
+    @classmethod
+    def burst(
+        cls,
+        count: int,
+        center: Tuple[float, float, float],
+        speed: float,
+        size: float = 0.1,
+        charge: float = 1.0,
+        rng: Optional[np.random.Generator] = None,
+    ) -> "BallSystem":
+        """All the balls start at one point, flying off in random directions.
+        Like the old per-ball code, the directions aren't uniform over the
+        sphere, but that's fine for this application."""
+        if rng is None:
+            rng = np.random.default_rng()
+        positions = np.tile(np.array(center, dtype=np.float64), (count, 1))
+        velocities = rng.random((count, 3)) * speed
+        return cls(
+            positions, velocities, np.full(count, size), np.full(count, charge)
+        )
+
+    @classmethod
+    def scattered(
+        cls,
+        count: int,
+        speed: float,
+        size: float = 0.1,
+        charge: float = 1.0,
+        rng: Optional[np.random.Generator] = None,
+    ) -> "BallSystem":
+        """The balls start spread uniformly through the box, moving in random
+        directions.  Large systems should start this way; a burst from one
+        point puts every ball in the same broad-phase cell."""
+        if rng is None:
+            rng = np.random.default_rng()
+        limit = 1 - WALL_BUFFER
+        positions = rng.uniform(-limit, limit, (count, 3))
+        velocities = rng.uniform(-speed, speed, (count, 3))
+        return cls(
+            positions, velocities, np.full(count, size), np.full(count, charge)
+        )
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def update(self, frame_scaling: float) -> None:
+        self.positions += self.velocities * frame_scaling
+        if self.collisions:
+            self.collide()
+        self.bounce_off_walls()
+
+    def bounce_off_walls(self) -> None:
+        upper_bound = 1 - WALL_BUFFER
+        lower_bound = -1 + WALL_BUFFER
+        for bound, beyond in (
+            (upper_bound, self.positions > upper_bound),
+            (lower_bound, self.positions < lower_bound),
+        ):
+            self.positions[beyond] = 2 * bound - self.positions[beyond]
+            self.velocities[beyond] = -self.velocities[beyond]
+
+    def collide(self) -> None:
+        """Resolves elastic collisions between touching balls that are
+        moving toward each other.  Mass goes as the cube of size.
+
+        A ball hitting several others in one step gets the sum of the
+        impulses, which isn't exact, but is stable enough at these speeds.
+        """
+        if len(self) < 2:
+            return
+        first, second = find_close_pairs(
+            self.positions, 2 * float(self.sizes.max())
+        )
+        delta = self.positions[second] - self.positions[first]
+        distance = np.linalg.norm(delta, axis=1)
+        closing = np.einsum(
+            "ij,ij->i", self.velocities[second] - self.velocities[first], delta
+        )
+        # Coincident balls have no meaningful contact normal; they'll drift
+        # apart on their own.
+        touching = (
+            (distance < self.sizes[first] + self.sizes[second])
+            & (distance > 1e-9)
+            & (closing < 0)
+        )
+        first, second = first[touching], second[touching]
+        normal = delta[touching] / distance[touching, np.newaxis]
+        closing = closing[touching] / distance[touching]
+
+        mass = self.sizes**3
+        total = mass[first] + mass[second]
+        impulse = (2 * closing / total)[:, np.newaxis] * normal
+        np.add.at(self.velocities, first, mass[second, np.newaxis] * impulse)
+        np.add.at(self.velocities, second, -mass[first, np.newaxis] * impulse)
+
+
+def find_close_pairs(
+    positions: np.ndarray, cell_size: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Uniform-grid broad phase.  Returns index arrays (first, second), with
+    first < second, of every pair of points in the same or adjacent cells.
+    Any two points closer than cell_size are guaranteed to be included."""
+    count = len(positions)
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    # Shift so the lowest cell is 1, leaving an empty layer on each side so
+    # that neighbor keys can never wrap around into another row.
+    cells -= cells.min(axis=0) - 1
+    dims = cells.max(axis=0) + 2
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    # Same-cell pairs, plus each pair of adjacent cells looked at from one
+    # side only: the 13 offsets that come after (0, 0, 0) in order.
+    offsets = [o for o in product((-1, 0, 1), repeat=3) if o >= (0, 0, 0)]
+    firsts = []
+    seconds = []
+    for d_x, d_y, d_z in offsets:
+        neighbor = keys + (d_x * dims[1] + d_y) * dims[2] + d_z
+        low = np.searchsorted(sorted_keys, neighbor, side="left")
+        high = np.searchsorted(sorted_keys, neighbor, side="right")
+        counts = high - low
+        total = counts.sum()
+        if not total:
+            continue
+        first = np.repeat(np.arange(count), counts)
+        run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(low, counts) + np.arange(total) - run_starts]
+        if (d_x, d_y, d_z) == (0, 0, 0):
+            keep = first < second
+            first, second = first[keep], second[keep]
+        firsts.append(np.minimum(first, second))
+        seconds.append(np.maximum(first, second))
+    if not firsts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def initial_system(
+    count: int, rng: Optional[np.random.Generator] = None
+) -> BallSystem:
+    """A handful of balls burst out from the center, as they always have.
+    More than that start scattered, since starting lots of balls at one point
+    would make them all collision candidates for each other until they spread
+    out."""
+    if count <= 10:
+        return BallSystem.burst(count, (0, 0, 0), DEFAULT_SPEED, rng=rng)
+    return BallSystem.scattered(count, DEFAULT_SPEED, rng=rng)
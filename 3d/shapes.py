@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
-from typing import NamedTuple, List, Dict
+from functools import lru_cache
+from typing import Dict, Callable, List, NamedTuple
 import numpy as np  # type: ignore
 
 # Note that this file is a very-direct port of some old WebGL code of mine; it
@@ -7,9 +8,12 @@ import numpy as np  # type: ignore
 
 
 class Geometry(NamedTuple):
-    points: List[np.ndarray]
-    faces: List[int]
-    colors: List[int]
+    """Vertex positions as an (n, 3) array, triangles as an (m, 3) array of
+    indices into it, and RGBA colors as an (n, 4) array of bytes."""
+
+    points: np.ndarray
+    faces: np.ndarray
+    colors: np.ndarray
 
 
 def make_tetrahedron_geometry() -> Geometry:
@@ -32,85 +36,153 @@ def make_tetrahedron_geometry() -> Geometry:
     point3 = np.array(
         [point1[0] * np.cos(phi), point1[1], point1[0] * np.sin(phi)]
     )
-    points = [point0, point1, point2, point3]
-    faces = [0, 1, 3, 0, 3, 2, 0, 2, 1, 1, 2, 3]
-    colors = [255, 0, 0, 255, 0, 255, 0, 255, 0, 0, 255, 255, 255, 0, 255, 255]
+    points = np.array([point0, point1, point2, point3])
+    faces = np.array([[0, 1, 3], [0, 3, 2], [0, 2, 1], [1, 2, 3]])
+    colors = np.array(
+        [
+            [255, 0, 0, 255],
+            [0, 255, 0, 255],
+            [0, 0, 255, 255],
+            [255, 0, 255, 255],
+        ],
+        dtype=np.uint8,
+    )
     return Geometry(points, faces, colors)
 
 
-def make_sphere_geometry(n: int) -> Geometry:
+def make_icosahedron_geometry() -> Geometry:
+    """This icosahedron is centered at the origin, and its points are on the
+    unit sphere.  Subdividing it gives much more even triangles than
+    subdividing the tetrahedron does, so it needs fewer of them to look
+    round."""
+    golden = (1 + np.sqrt(5)) / 2
+    # fmt: off
+    points = np.array([
+        [-1, golden, 0], [1, golden, 0], [-1, -golden, 0], [1, -golden, 0],
+        [0, -1, golden], [0, 1, golden], [0, -1, -golden], [0, 1, -golden],
+        [golden, 0, -1], [golden, 0, 1], [-golden, 0, -1], [-golden, 0, 1],
+    ])
+    faces = np.array([
+        [0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+        [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+        [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+        [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1],
+    ])
+    # fmt: on
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    return Geometry(points, faces, make_simple_colors(points))
+
+
+BASES: Dict[str, Callable[[], Geometry]] = {
+    "tetrahedron": make_tetrahedron_geometry,
+    "icosahedron": make_icosahedron_geometry,
+}
+
+
+def subdivide(points: np.ndarray, faces: np.ndarray):
+    """Splits each face into 4 triangles, putting the new points at the
+    great-circle midpoints of the edges.  It'll fail on an edge whose ends are
+    diametrically opposed."""
+    # Every edge of every face, as (lower, higher) index pairs, so that the two
+    # faces sharing an edge agree on it and share its midpoint.
+    edges = np.concatenate(
+        [faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [0, 2]]]
+    )
+    edges.sort(axis=1)
+    unique_edges, edge_ids = np.unique(edges, axis=0, return_inverse=True)
+    midpoints = points[unique_edges[:, 0]] + points[unique_edges[:, 1]]
+    # Normalization projects the points to the surface of the unit sphere.
+    midpoints /= np.linalg.norm(midpoints, axis=1, keepdims=True)
+
+    face_count = len(faces)
+    edge_ids = edge_ids.reshape(3, face_count) + len(points)
+    pi0, pi1, pi2 = faces.T
+    pi01, pi12, pi02 = edge_ids
+    new_faces = np.stack(
+        [
+            np.stack([pi0, pi01, pi02], axis=1),
+            np.stack([pi01, pi1, pi12], axis=1),
+            np.stack([pi12, pi2, pi02], axis=1),
+            np.stack([pi01, pi12, pi02], axis=1),
+        ],
+        axis=1,
+    ).reshape(-1, 3)
+    return np.concatenate([points, midpoints]), new_faces
+
+
+@lru_cache(maxsize=None)
+def make_sphere_geometry(n: int, base: str = "tetrahedron") -> Geometry:
     """
-    Starting with a tetrahedron, repeat n times:
+    Starting with a tetrahedron or an icosahedron, repeat n times:
     * Split each face into 4 triangles.
     * Push the new points out to the unit sphere.
+
+    The result is cached and shared by everyone who asks for the same n, so
+    its arrays are read-only.
     """
     assert n >= 0
-    midpoints: Dict[np.ndarray, np.ndarray]
-    midpoints = {}
-    shape = make_tetrahedron_geometry()
-    faces = shape.faces
+    shape = BASES[base]()
     points = shape.points
+    faces = shape.faces
     for _ in range(n):
-        new_faces = []
-        # Split each face into 4.
-        for face in range(0, len(faces), 3):
-            pi0 = faces[face]
-            pi1 = faces[face + 1]
-            pi2 = faces[face + 2]
-            pi01 = get_midpoint(pi0, pi1, points, midpoints)
-            pi12 = get_midpoint(pi1, pi2, points, midpoints)
-            pi02 = get_midpoint(pi0, pi2, points, midpoints)
-            # fmt: off
-            new_faces.extend([
-                pi0, pi01, pi02,
-                pi01, pi1, pi12,
-                pi12, pi2, pi02,
-                pi01, pi12, pi02
-            ])
-            # fmt: on
-        faces = new_faces
-    return Geometry(points, faces, make_simple_colors(points))
+        points, faces = subdivide(points, faces)
+    return freeze(
+        Geometry(
+            points.astype(np.float32),
+            faces.astype(np.int32),
+            make_simple_colors(points),
+        )
+    )
 
 
-def get_midpoint(pi0: np.ndarray, pi1: np.ndarray, points, midpoints) -> int:
-    """This is the great-circle midpoint of two points on the unit sphere.
-    It'll fail if they're diametrically opposed."""
-
-    def get_midpoint_key(a, b):
-        c = a
-        d = b
-        if a < b:
-            c = b
-            d = a
-        return (c, d)
-
-    def normalize(v):
-        norm = np.linalg.norm(v)
-        if norm < 0.0001:
-            return v
-        return v / norm
-
-    s = get_midpoint_key(pi0, pi1)
-    if s in midpoints:
-        return midpoints[s]
-    p_0 = points[pi0]
-    p_1 = points[pi1]
-    # Normalization projects the point to the surface of the unit sphere.
-    temp = normalize(p_0 + p_1)
-    index = len(points)
-    points.append(temp)
-    midpoints[s] = index
-    return index
-
-
-def make_simple_colors(points) -> List[int]:
-    colors = []
-    for point in points:
-        red = round(255 * abs(point[0]))
-        green = round(255 * abs(point[1]))
-        blue = round(255 * abs(point[2]))
-        colors.append(red)
-        colors.append(green)
-        colors.append(blue)
-        colors.append(255)
+def freeze(geometry: Geometry) -> Geometry:
+    for array in geometry:
+        array.flags.writeable = False
+    return geometry
+
+
+def make_simple_colors(points: np.ndarray) -> np.ndarray:
+    colors = np.full((len(points), 4), 255, dtype=np.uint8)
+    colors[:, :3] = np.round(255 * np.abs(points))
     return colors
+
+
+def max_edge_length(geometry: Geometry) -> float:
+    corners = geometry.points[geometry.faces]
+    edges = corners - np.roll(corners, 1, axis=1)
+    return float(np.linalg.norm(edges, axis=2).max())
+
+
+# Aim for triangle edges about this long on screen; any shorter and the
+# extra triangles don't make the outline any rounder.
+TARGET_EDGE_PIXELS = 6.0
+LOD_LEVELS = 6
+
+
+class SphereLOD:
+    """A chain of ever-finer spheres, levels 0 through LOD_LEVELS - 1, for
+    picking the coarsest one that still looks round at a given size."""
+
+    def __init__(self, base: str = "icosahedron", levels: int = LOD_LEVELS):
+        self.base = base
+        self.levels: List[Geometry] = [
+            make_sphere_geometry(n, base) for n in range(levels)
+        ]
+        # On the unit sphere; multiply by the on-screen radius to get pixels.
+        self.edge_lengths = [max_edge_length(g) for g in self.levels]
+
+    def levels_for_radii(
+        self,
+        radii_pixels: np.ndarray,
+        target_edge: float = TARGET_EDGE_PIXELS,
+    ) -> np.ndarray:
+        """The level to draw each sphere at, given its on-screen radius."""
+        # The largest radius each level is fine for; these only go up.
+        largest = target_edge / np.array(self.edge_lengths)
+        levels = np.searchsorted(largest, radii_pixels)
+        return np.minimum(levels, len(self.levels) - 1)
+
+
+@lru_cache(maxsize=None)
+def sphere_lod(base: str = "icosahedron") -> SphereLOD:
+    return SphereLOD(base)
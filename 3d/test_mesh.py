@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+import numpy as np  # type: ignore
+import pytest  # type: ignore
+
+from field import SURFACE_LEVEL, BallFieldInfo, get_field
+import mesh
+
+
+def surface_area(surface: mesh.Mesh) -> float:
+    corners = surface.vertices[surface.triangles].astype(np.float64)
+    crosses = np.cross(
+        corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+    )
+    return 0.5 * float(np.linalg.norm(crosses, axis=1).sum())
+
+
+@pytest.mark.parametrize("samples, budget", [(64, 1500), (30, 400)])
+def test_decimated_incremental_surface_keeps_its_area(samples, budget):
+    field_info = [
+        BallFieldInfo(1.0, 0.15, np.array([-0.4, 0.1, 0.0])),
+        BallFieldInfo(1.0, 0.2, np.array([0.3, -0.2, 0.2])),
+        BallFieldInfo(1.0, 0.1, np.array([0.1, 0.5, -0.4])),
+    ]
+    values = get_field(field_info, samples)
+    whole = mesh.mesh_from_field(values, SURFACE_LEVEL, budget)
+    incremental = mesh.IncrementalSurface(samples, SURFACE_LEVEL, budget)
+    # One slice at a time, out of order, is the hardest case.
+    for start in list(range(0, samples, 2)) + list(range(1, samples, 2)):
+        incremental.add_slices(values, start, start + 1)
+    assert incremental.done
+    decimated = incremental.decimated()
+    assert len(decimated.triangles) <= budget
+    assert surface_area(decimated) == pytest.approx(
+        surface_area(whole), rel=0.03
+    )
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+from typing import NamedTuple
+import numpy as np  # type: ignore
+
+# This turns a boolean occupancy grid into a quad mesh without ever looping
+# over cells in Python.  Instead of emitting a whole cube per filled voxel, we
+# only emit faces that have an empty neighbor on the other side, and then
+# merge runs of those faces into larger rectangles.  The interior of a blob
+# then costs nothing, and flat stretches of its surface become a few quads.
+
+
+class QuadMesh(NamedTuple):
+    """Flat float32 [x, y, z, ...] vertices, 4 per quad, and matching int32
+    indices suitable for GL_QUADS."""
+
+    vertices: np.ndarray
+    indices: np.ndarray
+
+
+def exposed_faces(filled: np.ndarray, axis: int, positive: bool) -> np.ndarray:
+    """Returns a mask of the filled cells whose face in the given direction
+    borders an empty cell or the edge of the grid."""
+    padded = np.pad(filled, 1, mode="constant", constant_values=False)
+    inner = tuple(slice(1, -1) for _ in range(3))
+    neighbor = list(inner)
+    neighbor[axis] = slice(2, None) if positive else slice(0, -2)
+    return filled & ~padded[tuple(neighbor)]
+
+
+def merge_faces(faces: np.ndarray) -> np.ndarray:
+    """Greedily merges a stack of 2D face masks into rectangles.
+
+    The mask is indexed [slice, u, v].  We first find maximal runs of set cells
+    along v in every row, then join runs that cover exactly the same span of v
+    in consecutive rows of the same slice.  Both passes are sorts and diffs
+    over arrays, so the cost is proportional to the number of runs, not cells.
+
+    Returns an (N, 5) int array of [slice, u0, u1, v0, v1] with exclusive ends.
+    """
+    padded = np.pad(faces, ((0, 0), (0, 0), (1, 1)), mode="constant")
+    edges = np.diff(padded.astype(np.int8), axis=2)
+    # np.nonzero returns indices in C order, so the n-th start and the n-th end
+    # always belong to the same run.
+    s, u, v0 = np.nonzero(edges == 1)
+    v1 = np.nonzero(edges == -1)[2]
+    if not len(s):
+        return np.zeros((0, 5), dtype=np.int64)
+
+    order = np.lexsort((u, v1, v0, s))
+    s, u, v0, v1 = s[order], u[order], v0[order], v1[order]
+    starts_group = np.ones(len(s), dtype=bool)
+    starts_group[1:] = (
+        (s[1:] != s[:-1])
+        | (v0[1:] != v0[:-1])
+        | (v1[1:] != v1[:-1])
+        | (u[1:] != u[:-1] + 1)
+    )
+    first = np.flatnonzero(starts_group)
+    last = np.append(first[1:], len(s)) - 1
+    return np.stack(
+        [s[first], u[first], u[last] + 1, v0[first], v1[first]], axis=1
+    )
+
+
+def make_voxel_mesh(filled: np.ndarray) -> QuadMesh:
+    """Builds the exposed, merged surface of an occupancy grid of shape
+    (samples, samples, samples) that spans [-1, 1] on each axis.
+
+    Each voxel is a cube one grid step wide centered on its sample point, so
+    the corners of cells sit half a step off the sample lattice.
+    """
+    samples = filled.shape[0]
+    step = 2 / (samples - 1)
+    quads = []
+    for axis in range(3):
+        # moveaxis keeps the other two axes in increasing order.
+        u_axis, v_axis = [a for a in range(3) if a != axis]
+        for positive in (False, True):
+            faces = np.moveaxis(exposed_faces(filled, axis, positive), axis, 0)
+            rects = merge_faces(faces)
+            plane = rects[:, 0] + (1 if positive else 0)
+            u0, u1, v0, v1 = rects[:, 1], rects[:, 2], rects[:, 3], rects[:, 4]
+            corners = np.empty((len(rects), 4, 3), dtype=np.float32)
+            corners[:, :, axis] = plane[:, np.newaxis]
+            corners[:, :, u_axis] = np.stack([u0, u1, u1, u0], axis=1)
+            corners[:, :, v_axis] = np.stack([v0, v0, v1, v1], axis=1)
+            quads.append(corners)
+    corners = np.concatenate(quads)
+    # Corner lattice index c sits at sample coordinate c - 0.5.
+    corners -= 0.5
+    corners *= step
+    corners -= 1
+    vertices = corners.reshape(-1)
+    indices = np.arange(len(corners) * 4, dtype=np.int32)
+    return QuadMesh(vertices, indices)
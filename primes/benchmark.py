@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Times the sieves, spirals and primality tests over a sweep of sizes.
+
+Every case is run for N = 10^4, 10^5, ... until the next N wouldn't fit in
+the memory that's free (by a rough bytes-per-N estimate for each case), or
+until a run takes longer than --max-seconds, whichever comes first.  For each
+run it records the time, the peak memory NumPy and Python allocated, and,
+where the case finds primes, how many and how many per second.  Memory is
+measured on a second run, under tracemalloc, and worker processes' memory
+isn't counted.
+
+Nothing gets drawn, and the results come out as JSON, so two runs can be
+diffed:
+
+    $ python3 benchmark.py --output before.json
+    $ python3 benchmark.py --cases sieve map_primes --max-n 1e8
+"""
+
+import argparse
+from math import isqrt
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import matplotlib  # type: ignore
+
+# Before primes imports pyplot, so that nothing ever tries to open a window.
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # type: ignore # noqa: E402
+import numpy as np  # type: ignore # noqa: E402
+
+import factor_sieve  # noqa: E402
+import miller_rabin  # noqa: E402
+import parallel_sieve  # noqa: E402
+import primes  # noqa: E402
+import spiral  # noqa: E402
+from prime_table import PrimeTable  # noqa: E402
+
+
+class Case(NamedTuple):
+    name: str
+    # Does the work for size n; returns how many primes it found, if that
+    # means anything for the case.
+    run: Callable[[int], Optional[int]]
+    # Roughly how much memory a run at size n needs, per unit of n.
+    bytes_per_n: float
+
+
+def count_spiral_out(n: int) -> None:
+    for _ in primes.spiral_out(isqrt(n)):
+        pass
+
+
+def offsets(n: int) -> None:
+    spiral.spiral_offsets(np.arange(n))
+
+
+def coords(n: int) -> None:
+    primes.map_coords(isqrt(n))
+
+
+def plot(n: int) -> None:
+    with warnings.catch_warnings():
+        # Agg can't show anything, and says so.
+        warnings.simplefilter("ignore", UserWarning)
+        primes.plot_primes(isqrt(n))
+    # Agg's show doesn't draw anything, so this does what it would have.
+    plt.gcf().canvas.draw()
+    plt.close("all")
+
+
+def table_pi(n: int) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        with PrimeTable(os.path.join(directory, "primes")) as table:
+            return table.pi(n - 1)
+
+
+def far_window(n: int) -> int:
+    """A square window of about n numbers, 10^5 rows out."""
+    side = max(isqrt(n), 1)
+    return int(primes.map_window(100_000, 0, side, side).sum())
+
+
+def parallel_count(n: int) -> int:
+    with parallel_sieve.parallel_sieve(n) as bitmap:
+        return bitmap.count()
+
+
+CASES = [
+    Case("sieve", lambda n: len(primes.sieve(n)), 2),
+    Case("parallel_sieve", parallel_count, 1),
+    Case("prime_table", table_pi, 1),
+    Case("spiral_out", count_spiral_out, 1),
+    Case("spiral_offsets", offsets, 96),
+    Case("map_primes", lambda n: int(primes.map_primes(isqrt(n)).sum()), 12),
+    Case("map_coords", coords, 10),
+    Case("plot_primes", plot, 24),
+    Case("map_window", far_window, 64),
+    Case(
+        "miller_rabin",
+        lambda n: int(
+            miller_rabin.are_prime(np.arange(10**12, 10**12 + n)).sum()
+        ),
+        32,
+    ),
+    Case(
+        "factor_sieve",
+        lambda n: int(
+            np.count_nonzero(
+                factor_sieve.smallest_factor_sieve(n - 1) == np.arange(n)
+            )
+        ),
+        16,
+    ),
+]
+
+
+def available_memory() -> int:
+    """Bytes of physical memory that are free right now."""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        # Not on Linux; assume a modest machine.
+        return 1 << 31
+
+
+def measure(case: Case, n: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    found = case.run(n)
+    seconds = time.perf_counter() - start
+    # tracemalloc slows down anything that makes lots of Python objects
+    # several times over, so memory gets its own run.
+    tracemalloc.start()
+    case.run(n)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "n": n,
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "primes": found,
+        "primes_per_second": None if found is None else found / seconds,
+    }
+
+
+def sweep(
+    case: Case, max_n: Optional[int], max_seconds: float
+) -> List[Dict[str, Any]]:
+    results = []
+    n = 10**4
+    while max_n is None or n <= max_n:
+        # Only half of what's free, to leave room for everything else.
+        if n * case.bytes_per_n > available_memory() / 2:
+            break
+        result = measure(case, n)
+        results.append(result)
+        print(
+            f"{case.name:>16} {n:>14,} {result['seconds']:10.3f}s "
+            f"{result['peak_bytes'] / 2**20:10.1f} MB",
+            file=sys.stderr,
+        )
+        if result["seconds"] > max_seconds:
+            break
+        n *= 10
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the primes module; JSON results on stdout."
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        choices=[case.name for case in CASES],
+        default=[case.name for case in CASES],
+    )
+    parser.add_argument(
+        "--max-n",
+        type=lambda text: int(float(text)),
+        default=None,
+        help="the largest N to try, like 1e8",
+    )
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=10,
+        help="stop sweeping a case after a run that takes longer than this",
+    )
+    parser.add_argument("--output", help="write the JSON here instead")
+    args = parser.parse_args()
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cases": {
+            case.name: sweep(case, args.max_n, args.max_seconds)
+            for case in CASES
+            if case.name in args.cases
+        },
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Looks for prime-rich quadratics, which are the diagonals of the spiral.
+
+Every diagonal ray of the spiral, going out from near the center, has the
+numbers 4n^2 + bn + c on it for n = 0, 1, 2, ..., with b and c fixed; that's
+why the dense lines in plot_primes are straight.  This scores every (b, c) in
+a range by how many primes its polynomial hits for n < n_max.
+
+The primes come from one parallel_sieve bitmap covering the biggest value any
+of the polynomials reaches.  The (b, c) pairs are split into tasks for a
+process pool, and each worker evaluates its polynomials a block at a time as
+a 2D array, one row per polynomial, looking every value up in the shared
+bitmap, so no polynomial is ever walked one value at a time.
+
+    $ python3 diagonals.py -b -100 100 -c -1000 1000 --n-max 1000
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, NamedTuple, Optional, Sequence
+import os
+
+import numpy as np  # type: ignore
+
+import parallel_sieve
+
+# Roughly how many polynomial values to have in flight at once, per worker.
+CELL_CHUNK = 1 << 20
+
+
+class Polynomial(NamedTuple):
+    b: int
+    c: int
+    # How many of 4n^2 + bn + c for 0 <= n < n_max are prime.
+    primes: int
+
+
+def largest_value(
+    b_values: np.ndarray, c_values: np.ndarray, n_max: int
+) -> int:
+    """A bound on 4n^2 + bn + c over all the pairs and n < n_max."""
+    n = n_max - 1
+    b = int(np.abs(b_values).max())
+    c = int(np.abs(c_values).max())
+    return 4 * n * n + b * n + c
+
+
+def is_prime_lookup(bits: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Which values are prime, looked up in a PrimeBitmap's bits.  Values
+    below 2 count as not prime; every value must be below the bitmap's
+    up_to."""
+    odd = (values & 1) == 1
+    slots = values >> 1
+    # Everything even or negative looks up slot 0, which is 1, not prime.
+    slots = np.where(odd & (values > 0), slots, 0)
+    is_prime = (bits[slots >> 3] >> (slots & 7).astype(np.uint8)) & 1
+    return (is_prime == 1) | (values == 2)
+
+
+def count_primes(
+    bits: np.ndarray, b_values: np.ndarray, c_values: np.ndarray, n_max: int
+) -> np.ndarray:
+    """How many primes each 4n^2 + b_values[i] n + c_values[i] hits for
+    n < n_max."""
+    n = np.arange(n_max, dtype=np.int64)
+    quadratic = 4 * n * n
+    counts = np.zeros(len(b_values), dtype=np.int64)
+    block = max(1, CELL_CHUNK // max(n_max, 1))
+    for first in range(0, len(b_values), block):
+        b = b_values[first : first + block, np.newaxis]
+        c = c_values[first : first + block, np.newaxis]
+        values = quadratic + b * n + c
+        counts[first : first + block] = is_prime_lookup(bits, values).sum(1)
+    return counts
+
+
+def count_primes_in(
+    name: str, b_values: np.ndarray, c_values: np.ndarray, n_max: int
+) -> np.ndarray:
+    """count_primes against the shared bitmap called name, for the pool."""
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        bits = np.ndarray(
+            (len(memory.buf),), dtype=np.uint8, buffer=memory.buf
+        )
+        counts = count_primes(bits, b_values, c_values, n_max)
+        del bits
+    finally:
+        memory.close()
+    return counts
+
+
+def scan(
+    b_range: Sequence[int],
+    c_range: Sequence[int],
+    n_max: int,
+    top: int = 10,
+    workers: Optional[int] = None,
+    tasks_per_worker: int = 4,
+) -> List[Polynomial]:
+    """Scores every polynomial 4n^2 + bn + c with b and c in the inclusive
+    ranges b_range and c_range, and returns the top that hit the most primes
+    for n < n_max, best first."""
+    workers = workers or os.cpu_count() or 1
+    b_grid, c_grid = np.meshgrid(
+        np.arange(b_range[0], b_range[1] + 1, dtype=np.int64),
+        np.arange(c_range[0], c_range[1] + 1, dtype=np.int64),
+        indexing="ij",
+    )
+    b_values = b_grid.ravel()
+    c_values = c_grid.ravel()
+    up_to = largest_value(b_values, c_values, n_max) + 1
+    with parallel_sieve.parallel_sieve(up_to, workers) as bitmap:
+        if workers == 1:
+            counts = count_primes(bitmap.bits, b_values, c_values, n_max)
+        else:
+            per_task = -(-len(b_values) // (workers * tasks_per_worker))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(
+                        count_primes_in,
+                        bitmap.memory.name,
+                        b_values[first : first + per_task],
+                        c_values[first : first + per_task],
+                        n_max,
+                    )
+                    for first in range(0, len(b_values), per_task)
+                ]
+                counts = np.concatenate([f.result() for f in futures])
+    # Stable, so ties keep the order of the scan.
+    best = np.argsort(-counts, kind="stable")[:top]
+    return [
+        Polynomial(int(b_values[i]), int(c_values[i]), int(counts[i]))
+        for i in best
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the quadratics 4n^2 + bn + c with the most primes."
+    )
+    parser.add_argument("-b", nargs=2, type=int, default=[-50, 50])
+    parser.add_argument("-c", nargs=2, type=int, default=[-500, 500])
+    parser.add_argument("--n-max", type=int, default=1000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    for polynomial in scan(args.b, args.c, args.n_max, args.top, args.workers):
+        print(
+            f"4n^2 {polynomial.b:+d}n {polynomial.c:+d}: "
+            f"{polynomial.primes} primes in {args.n_max}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""A smallest-prime-factor sieve, for factoring every number up to a bound.
+
+spf[n] is the smallest prime dividing n, for 2 <= n <= the bound; 0 and 1
+get 0.  With that, any n factors by dividing out spf[n] until there's
+nothing left, which takes at most log2(n) steps, and a whole array of
+numbers can take those steps together.  That's how the statistics below are
+computed, for every pixel of a spiral at once.
+"""
+
+from math import isqrt
+from typing import NamedTuple
+import numpy as np  # type: ignore
+
+import segmented_sieve
+
+
+def smallest_factor_sieve(up_to: int) -> np.ndarray:
+    """spf[n] for every n <= up_to, as a uint32 array."""
+    spf = np.zeros(up_to + 1, dtype=np.uint32)
+    spf[4::2] = 2
+    # Going down from the biggest base prime means the smallest one to cross
+    # a number off is the last to write it.  Every composite n has a factor
+    # no bigger than its square root, so that covers them all.
+    for p in segmented_sieve.small_primes(isqrt(up_to))[:0:-1].tolist():
+        spf[p * p :: 2 * p] = p
+    unset = np.flatnonzero(spf[2:] == 0) + 2
+    spf[unset] = unset
+    return spf
+
+
+class FactorStats(NamedTuple):
+    # Prime factors counted with multiplicity, so 12 has 3.
+    factor_count: np.ndarray
+    divisor_count: np.ndarray
+    largest_factor: np.ndarray
+
+
+def factor_stats(spf: np.ndarray, numbers: np.ndarray) -> FactorStats:
+    """Factors every one of numbers, which must all be in 1..len(spf) - 1,
+    together; 1 has no factors, 1 divisor, and a largest factor of 1."""
+    shape = np.shape(numbers)
+    remaining = np.array(numbers, dtype=np.uint32).ravel()
+    factor_count = np.zeros(len(remaining), dtype=np.uint8)
+    divisor_count = np.ones(len(remaining), dtype=np.uint32)
+    largest_factor = np.ones(len(remaining), dtype=np.uint32)
+    exponent = np.zeros(len(remaining), dtype=np.uint32)
+    active = np.flatnonzero(remaining > 1)
+    while len(active):
+        p = spf[remaining[active]]
+        # Factors come out smallest first, so a new one closes off the
+        # exponent of the last.
+        new = p != largest_factor[active]
+        closing = active[new]
+        divisor_count[closing] *= exponent[closing] + 1
+        exponent[closing] = 0
+        exponent[active] += 1
+        factor_count[active] += 1
+        largest_factor[active] = p
+        remaining[active] //= p
+        active = active[remaining[active] > 1]
+    divisor_count *= exponent + 1
+    return FactorStats(
+        factor_count.reshape(shape),
+        divisor_count.reshape(shape),
+        largest_factor.reshape(shape),
+    )
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Deterministic Miller-Rabin for anything that fits in 64 bits.
+
+For numbers too big to sieve up to, but not too many of them: far-out
+diagonals of the spiral, random samples, and so on.  Testing against the
+first twelve primes as witnesses is enough to be exact for every n < 2^64,
+so nothing here is probabilistic.
+
+The batch version does the cheap part over the whole array first, with trial
+division by the small primes knocking out most composites, and only runs the
+modular exponentiations, which need Python's big ints, on what's left.
+"""
+
+from typing import Iterable
+import numpy as np  # type: ignore
+
+import segmented_sieve
+
+# Enough witnesses for every n < 3.3 * 10^24, which is comfortably past 2^64.
+WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+# Trial division by every prime below this happens before any exponentiation.
+TRIAL_LIMIT = 1000
+TRIAL_PRIMES = segmented_sieve.small_primes(TRIAL_LIMIT - 1).astype(np.uint64)
+
+
+def passes_miller_rabin(n: int) -> bool:
+    """The strong probable prime test for every witness.  n must be odd and
+    bigger than the largest witness."""
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in WITNESSES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def is_prime(n: int) -> bool:
+    """Whether n is prime, for any 0 <= n < 2^64."""
+    if n < TRIAL_LIMIT:
+        return bool(np.any(TRIAL_PRIMES == n))
+    for p in TRIAL_PRIMES.tolist():
+        if n % p == 0:
+            return False
+    return passes_miller_rabin(n)
+
+
+def are_prime(candidates: Iterable[int]) -> np.ndarray:
+    """is_prime over a whole array of candidates at once, each 0 <= n < 2^64;
+    returns a bool array of the same shape."""
+    n = np.asarray(candidates, dtype=np.uint64)
+    flat = n.ravel()
+    result = np.zeros(len(flat), dtype=bool)
+    small = flat < TRIAL_LIMIT
+    result[small] = np.isin(flat[small], TRIAL_PRIMES)
+    # Everything else is a survivor until some small prime divides it.
+    survivors = np.flatnonzero(~small)
+    for p in TRIAL_PRIMES:
+        if not len(survivors):
+            break
+        survivors = survivors[flat[survivors] % p != 0]
+    result[survivors] = [
+        passes_miller_rabin(value) for value in flat[survivors].tolist()
+    ]
+    return result.reshape(n.shape)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Runs segmented_sieve over a process pool.
+
+The base primes up to the square root of the bound are found once, up front.
+Then each worker sieves its own run of segments and writes them, bit-packed,
+straight into one shared-memory bitmap of the odd numbers, so nothing gets
+shipped back through the pool, and the bitmap is never copied to put it
+together.
+
+    >>> with parallel_sieve(10**9, workers=8) as bitmap:
+    ...     bitmap.count()
+    50847534
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from math import isqrt
+from multiprocessing import shared_memory
+from typing import Optional
+import os
+
+import numpy as np  # type: ignore
+
+import segmented_sieve
+from segmented_sieve import BIT_COUNTS, SEGMENT_SLOTS
+
+
+class PrimeBitmap:
+    """Bit k, least significant first within each byte, is set if 2k + 1 is
+    prime, for every odd number below up_to.  2, being even, isn't in it.
+
+    The bits live in shared memory, which is released by close(), or on
+    leaving a with block.
+    """
+
+    def __init__(self, up_to: int):
+        self.up_to = up_to
+        self.slots = up_to // 2
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=max(1, -(-self.slots // 8))
+        )
+        self.bits = np.ndarray(
+            (len(self.memory.buf),), dtype=np.uint8, buffer=self.memory.buf
+        )
+        self.bits[:] = 0
+
+    def __enter__(self) -> "PrimeBitmap":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # The array has to let go of the buffer before it can be closed.
+        del self.bits
+        self.memory.close()
+        self.memory.unlink()
+
+    def count(self) -> int:
+        """How many primes are below up_to."""
+        set_bits = BIT_COUNTS[self.bits].sum(dtype=np.int64)
+        return int(set_bits) + (self.up_to > 2)
+
+    def primes(self, low: int = 0, high: Optional[int] = None) -> np.ndarray:
+        """The primes p with low <= p < high, as an int64 array.  Only the
+        bytes covering the range get unpacked."""
+        high = self.up_to if high is None else min(high, self.up_to)
+        return segmented_sieve.primes_in_bitmap(self.bits, low, high)
+
+
+def sieve_slots_into(
+    name: str,
+    first_slot: int,
+    stop_slot: int,
+    base: np.ndarray,
+    segment_slots: int,
+) -> None:
+    """Sieves odd-number slots [first_slot, stop_slot) into the shared bitmap
+    called name, a segment at a time.  first_slot must be a multiple of 8, so
+    that no two workers ever write to the same byte."""
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        bits = np.ndarray(
+            (len(memory.buf),), dtype=np.uint8, buffer=memory.buf
+        )
+        for low, high in segmented_sieve.segment_bounds(
+            2 * first_slot, 2 * stop_slot, segment_slots
+        ):
+            is_prime = segmented_sieve.sieve_odd_slots(low, high, base)
+            packed = np.packbits(is_prime, bitorder="little")
+            first_byte = low // 2 // 8
+            bits[first_byte : first_byte + len(packed)] = packed
+        del bits
+    finally:
+        memory.close()
+
+
+def parallel_sieve(
+    up_to: int,
+    workers: Optional[int] = None,
+    segment_slots: int = SEGMENT_SLOTS,
+    tasks_per_worker: int = 4,
+) -> PrimeBitmap:
+    """Sieves every odd number below up_to into a new PrimeBitmap, spread over
+    a pool of workers processes, one per CPU by default.  The caller owns
+    the bitmap and should close it."""
+    workers = workers or os.cpu_count() or 1
+    # Segments have to start on a whole byte of the bitmap.
+    segment_slots = -(-segment_slots // 8) * 8
+    base = segmented_sieve.small_primes(isqrt(max(up_to - 1, 0)))
+    bitmap = PrimeBitmap(up_to)
+    # A few tasks per worker evens out the load, since segments near the
+    # bottom have more base primes to cross off.
+    segments = -(-bitmap.slots // segment_slots)
+    per_task = max(1, -(-segments // (workers * tasks_per_worker)))
+    task_slots = per_task * segment_slots
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    sieve_slots_into,
+                    bitmap.memory.name,
+                    first,
+                    min(first + task_slots, bitmap.slots),
+                    base,
+                    segment_slots,
+                )
+                for first in range(0, bitmap.slots, task_slots)
+            ]
+            for future in futures:
+                future.result()
+    except BaseException:
+        bitmap.close()
+        raise
+    return bitmap
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""A table of primes kept on disk, so that it only ever gets sieved once.
+
+The table is two files.  path.bits is a bitmap of the odd numbers, one bit
+each, least significant bit first, just as segmented_sieve lays them out.
+path.counts holds, for each block of BLOCK_BYTES of the bitmap, how many
+primes come before it.  Both are memory-mapped, so a query only touches the
+pages it needs: is_prime reads one bit, and pi and nth_prime read one count
+and count bits in one block.
+
+The table covers every number below limit, and grows, a whole number of
+blocks at a time, whenever a query or extend() reaches past that.
+
+    >>> with PrimeTable("primes") as table:
+    ...     table.pi(10**9), table.nth_prime(10**6), table.is_prime(999999937)
+    (50847534, 15485863, True)
+"""
+
+from math import isqrt, log
+import os
+from typing import Optional
+
+import numpy as np  # type: ignore
+
+import segmented_sieve
+from segmented_sieve import BIT_COUNTS, SEGMENT_SLOTS
+
+BLOCK_BYTES = 1 << 12
+# Each bit is an odd number, so each block covers twice as many numbers as it
+# has bits.
+BLOCK_NUMBERS = 16 * BLOCK_BYTES
+
+
+class PrimeTable:
+    def __init__(self, path: str, up_to: int = 0):
+        self.bits_path = path + ".bits"
+        self.counts_path = path + ".counts"
+        for name in [self.bits_path, self.counts_path]:
+            if not os.path.exists(name):
+                open(name, "wb").close()
+        self.bits: Optional[np.memmap] = None
+        self.counts: Optional[np.memmap] = None
+        self.blocks = self.recover()
+        self.map()
+        if up_to > self.limit:
+            self.extend(up_to)
+
+    def __enter__(self) -> "PrimeTable":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def limit(self) -> int:
+        """Every number below this is in the table."""
+        return self.blocks * BLOCK_NUMBERS
+
+    def recover(self) -> int:
+        """Works out how many whole blocks are on disk.  Bits get written
+        before their counts, so if an extension was interrupted, whatever is
+        past the last count gets dropped."""
+        counted = os.path.getsize(self.counts_path) // 8 - 1
+        blocks = max(
+            0, min(os.path.getsize(self.bits_path) // BLOCK_BYTES, counted)
+        )
+        with open(self.bits_path, "r+b") as bits_file:
+            bits_file.truncate(blocks * BLOCK_BYTES)
+        with open(self.counts_path, "r+b") as counts_file:
+            if blocks == 0:
+                counts_file.truncate(0)
+                counts_file.write(np.zeros(1, dtype="<u8").tobytes())
+            else:
+                counts_file.truncate((blocks + 1) * 8)
+        return blocks
+
+    def map(self) -> None:
+        # np.memmap can't map an empty file.
+        self.bits = (
+            np.memmap(self.bits_path, dtype=np.uint8, mode="r")
+            if self.blocks
+            else np.zeros(0, dtype=np.uint8)
+        )
+        self.counts = np.memmap(self.counts_path, dtype="<u8", mode="r")
+
+    def close(self) -> None:
+        # Dropping the maps is what unmaps the files.
+        self.bits = None
+        self.counts = None
+
+    def extend(self, up_to: int) -> None:
+        """Sieves whole blocks onto the end of the table until it covers every
+        number below up_to."""
+        blocks = -(-up_to // BLOCK_NUMBERS)
+        if blocks <= self.blocks:
+            return
+        low = self.limit
+        high = blocks * BLOCK_NUMBERS
+        base = segmented_sieve.small_primes(isqrt(high - 1))
+        total = int(self.counts[-1])
+        self.close()
+        with open(self.bits_path, "ab") as bits_file, open(
+            self.counts_path, "ab"
+        ) as counts_file:
+            # Segments are a whole number of blocks, and so is the range.
+            for start, stop in segmented_sieve.segment_bounds(
+                low, high, SEGMENT_SLOTS
+            ):
+                is_prime = segmented_sieve.sieve_odd_slots(start, stop, base)
+                packed = np.packbits(is_prime, bitorder="little")
+                per_block = (
+                    BIT_COUNTS[packed.reshape(-1, BLOCK_BYTES)]
+                    .sum(axis=1, dtype=np.uint64)
+                    .astype("<u8")
+                )
+                bits_file.write(packed.tobytes())
+                bits_file.flush()
+                counts_file.write(
+                    (total + np.cumsum(per_block, dtype=np.uint64))
+                    .astype("<u8")
+                    .tobytes()
+                )
+                counts_file.flush()
+                total += int(per_block.sum())
+        self.blocks = blocks
+        self.map()
+
+    def odd_primes_below_slot(self, slot: int) -> int:
+        """How many of slots [1, slot) are prime; that is, how many odd primes
+        are below 2 * slot + 1."""
+        block, within = divmod(slot, 8 * BLOCK_BYTES)
+        first_byte = block * BLOCK_BYTES
+        whole_bytes, bits = divmod(within, 8)
+        count = int(self.counts[block])
+        count += int(
+            BIT_COUNTS[self.bits[first_byte : first_byte + whole_bytes]].sum()
+        )
+        if bits:
+            byte = int(self.bits[first_byte + whole_bytes])
+            count += bin(byte & ((1 << bits) - 1)).count("1")
+        return count
+
+    def is_prime(self, n: int) -> bool:
+        if n < 3:
+            return n == 2
+        if n % 2 == 0:
+            return False
+        if n >= self.limit:
+            self.extend(n + 1)
+        slot = n // 2
+        return bool((self.bits[slot // 8] >> (slot % 8)) & 1)
+
+    def pi(self, x: int) -> int:
+        """How many primes are <= x."""
+        if x < 2:
+            return 0
+        if x >= self.limit:
+            self.extend(x + 1)
+        # Slots below (x + 1) // 2 are the odd numbers <= x.
+        return 1 + self.odd_primes_below_slot((x + 1) // 2)
+
+    def nth_prime(self, k: int) -> int:
+        """The kth prime, counting 2 as the first."""
+        if k < 1:
+            raise ValueError(f"There's no prime number {k}")
+        if k == 1:
+            return 2
+        wanted = k - 1  # Odd primes.
+        while int(self.counts[-1]) < wanted:
+            self.extend(max(upper_bound_of_nth_prime(k), 2 * self.limit))
+        # The block holding it is the last one with fewer before it.
+        block = int(np.searchsorted(self.counts, wanted, side="left")) - 1
+        needed = wanted - int(self.counts[block])
+        first_byte = block * BLOCK_BYTES
+        is_prime = np.unpackbits(
+            self.bits[first_byte : first_byte + BLOCK_BYTES], bitorder="little"
+        )
+        slot = 8 * first_byte + int(np.flatnonzero(is_prime)[needed - 1])
+        return 2 * slot + 1
+
+    def primes_in_range(self, low: int, high: int) -> np.ndarray:
+        """All the primes p with low <= p < high, as an int64 array, reading
+        only the part of the table that covers them."""
+        if low < high and high > self.limit:
+            self.extend(high)
+        return segmented_sieve.primes_in_bitmap(self.bits, low, high)
+
+
+def upper_bound_of_nth_prime(k: int) -> int:
+    """Rosser's bound: the kth prime is below k (ln k + ln ln k) for k >= 6."""
+    if k < 6:
+        return 13
+    return int(k * (log(k) + log(log(k)))) + 1
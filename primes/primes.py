@@ -1,26 +1,26 @@
 #!/usr/bin/env python3
+from typing import Iterator, Optional, Tuple
 import numpy as np  # type: ignore
 import matplotlib.pyplot as plt  # type: ignore
 
+import factor_sieve
+import parallel_sieve
+from prime_table import PrimeTable
+import segmented_sieve
+import spiral
+
+CELL_CHUNK = 1 << 20
 
-def sieve(up_to: int):
-    """Sieve code adapted from
-    https://code.activestate.com/recipes/117119-sieve-of-eratosthenes/ which is
-    available under the PSF license.
-    """
-    composites = {}
-    cur = 2
-    primes = []
-    while cur < up_to:
-        if cur not in composites:
-            primes.append(cur)
-            composites[cur * cur] = [cur]  # Cur is the only factor of cur^2.
-        else:
-            for factor in composites[cur]:
-                composites.setdefault(cur + factor, []).append(factor)
-            del composites[cur]
-        cur += 1
-    return primes
+
+def sieve(up_to: int, workers: int = 1) -> np.ndarray:
+    """All the primes below up_to, in order.  This used to be a dict-of-lists
+    incremental sieve, which ran out of memory long before 10^9; see
+    segmented_sieve.py for what replaced it.  With more than one worker, the
+    sieving is spread over a process pool; see parallel_sieve.py."""
+    if workers > 1:
+        with parallel_sieve.parallel_sieve(up_to, workers) as bitmap:
+            return bitmap.primes()
+    return segmented_sieve.sieve(up_to)
 
 
 def spiral_out(square_size: int):
@@ -54,18 +54,72 @@ def spiral_out(square_size: int):
             vector = rotate.dot(vector)
 
 
-def map_primes(square_size: int):
+def prime_mask(up_to: int, table: Optional[PrimeTable] = None) -> np.ndarray:
+    """is_prime[i] for every i below up_to.  Given a PrimeTable, the primes
+    come from it, so they only get sieved the first time."""
+    is_prime = np.zeros(up_to, dtype=bool)
+    if table is not None:
+        is_prime[table.primes_in_range(0, up_to)] = True
+    else:
+        is_prime[sieve(up_to)] = True
+    return is_prime
+
+
+def spiral_rows(square_size: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yields (first row, spiral steps) for blocks of rows of the square, so
+    that images can be filled in order, from the inverse mapping, with only
+    a block's worth of temporaries at a time."""
+    block = max(1, CELL_CHUNK // max(square_size, 1))
+    center = square_size // 2
+    cols = np.arange(square_size) - center
+    for first in range(0, square_size, block):
+        rows = np.arange(first, min(first + block, square_size)) - center
+        yield first, spiral.spiral_index(rows[:, np.newaxis], cols)
+
+
+def map_primes(square_size: int, table: Optional[PrimeTable] = None):
     count = square_size * square_size
     display = np.zeros([square_size, square_size])
-    primes = set(sieve(count + 2))
-    generator = spiral_out(square_size)
-    for i in range(2, count):
-        coords = next(generator)
-        if i in primes:
-            display[tuple(coords)] = 1
+    is_prime = prime_mask(count + 2, table)
+    # The spiral has always started from 2 at the center, with step i of it
+    # holding i + 2, and stopped short of the last two cells.
+    for first, steps in spiral_rows(square_size):
+        numbers = steps + 2
+        in_range = numbers < count
+        display[first : first + len(steps)] = in_range & is_prime[numbers]
     return display
 
 
+def map_window(
+    top: int, left: int, height: int, width: int, center: int = 2
+) -> np.ndarray:
+    """Marks the primes in any height x width window of the spiral, however
+    far out.  top and left are offsets from the center of the spiral, where
+    the number center sits; the default matches map_primes, so
+
+        map_window(-(n // 2), -(n // 2), n, n)
+
+    is map_primes(n), apart from the last two cells, which map_primes leaves
+    out.
+
+    Only the numbers actually in the window get tested.  Sorted, they fall
+    into a few runs of consecutive numbers per ring of the spiral that the
+    window crosses, and those runs are sieved together, so the cost goes with
+    the size of the window rather than with how far out it is.
+    """
+    rows = np.arange(top, top + height)[:, np.newaxis]
+    cols = np.arange(left, left + width)
+    numbers = spiral.spiral_index(rows, cols) + center
+    values, where = np.unique(numbers, return_inverse=True)
+    breaks = np.flatnonzero(np.diff(values) != 1) + 1
+    lows = values[np.concatenate([[0], breaks])]
+    highs = values[np.concatenate([breaks - 1, [len(values) - 1]])] + 1
+    # The runs hold exactly the window's values, in order, so this lines up
+    # with values.
+    is_prime = segmented_sieve.sieve_runs(lows, highs)
+    return is_prime[where].reshape(height, width)
+
+
 def plot_primes(square_size: int):
     fig, ax = plt.subplots()
 
@@ -73,18 +127,43 @@ def plot_primes(square_size: int):
     ax.imshow(primes)
     ax.set_title("Primes are marked in yellow.")
     ax.axis("off")
-    fig.canvas.set_window_title("Ulam Spiral")
+    fig.canvas.manager.set_window_title("Ulam Spiral")
+    plt.show()
+
+
+def map_factor_stat(square_size: int, statistic: str) -> np.ndarray:
+    """Like map_primes, but with one of the factor_sieve.FactorStats of each
+    number in place of whether it's prime; cells past the end of the spiral
+    get 0."""
+    count = square_size * square_size
+    display = np.zeros([square_size, square_size])
+    spf = factor_sieve.smallest_factor_sieve(count + 1)
+    for first, steps in spiral_rows(square_size):
+        numbers = steps + 2
+        in_range = numbers < count
+        stats = factor_sieve.factor_stats(spf, np.where(in_range, numbers, 1))
+        values = getattr(stats, statistic)
+        display[first : first + len(steps)] = np.where(in_range, values, 0)
+    return display
+
+
+def plot_factor_stat(square_size: int, statistic: str = "divisor_count"):
+    fig, ax = plt.subplots()
+
+    values = map_factor_stat(square_size, statistic)
+    image = ax.imshow(values)
+    fig.colorbar(image, ax=ax)
+    ax.set_title(f"{statistic.replace('_', ' ').capitalize()} of each number")
+    ax.axis("off")
+    fig.canvas.manager.set_window_title("Ulam Spiral")
     plt.show()
 
 
 def map_coords(square_size: int):
     """This is test code to display the spiral path."""
-    count = square_size * square_size
     display = np.zeros([square_size, square_size])
-    generator = spiral_out(square_size)
-    for i in range(count):
-        coords = next(generator)
-        display[tuple(coords)] = i
+    for first, steps in spiral_rows(square_size):
+        display[first : first + len(steps)] = steps
     return display
 
 
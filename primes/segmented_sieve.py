@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""A segmented Sieve of Eratosthenes over the odd numbers.
+
+Only odd numbers get a slot, so slot k stands for 2k + 1.  The range is
+sieved a segment at a time, each segment small enough to stay in cache, with
+the primes up to the square root of the range crossing off their multiples in
+each one.  Apart from the primes it returns, that's all the memory it needs.
+"""
+
+from math import isqrt
+from typing import Iterator, Optional, Tuple
+import numpy as np  # type: ignore
+
+# Slots per segment.  Segments are one byte per odd number while they're being
+# sieved; at 256K that's comfortably inside a typical L2 cache.
+SEGMENT_SLOTS = 1 << 18
+
+# How many bits are set in each possible byte, for counting primes in packed
+# bitmaps.
+BIT_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def primes_in_bitmap(bits: np.ndarray, low: int, high: int) -> np.ndarray:
+    """The primes p with low <= p < high, as an int64 array, from a packed
+    bitmap of the odd numbers: bit k, least significant first within each
+    byte, set if 2k + 1 is prime.  The bitmap must reach at least as far as
+    high, and only the bytes covering the range get unpacked."""
+    low = max(low, 0)
+    if high <= low:
+        return np.zeros(0, dtype=np.int64)
+    first_byte = low // 2 // 8
+    last_byte = -(-(high // 2) // 8)
+    is_prime = np.unpackbits(bits[first_byte:last_byte], bitorder="little")
+    numbers = 2 * (np.flatnonzero(is_prime) + 8 * first_byte) + 1
+    numbers = numbers[(numbers >= low) & (numbers < high)]
+    if low <= 2 < high:
+        numbers = np.concatenate([[2], numbers])
+    return numbers.astype(np.int64)
+
+
+def small_primes(limit: int) -> np.ndarray:
+    """All the primes <= limit, in one piece.  This is for the base primes,
+    which only go up to the square root of the range being sieved."""
+    if limit < 2:
+        return np.zeros(0, dtype=np.int64)
+    is_prime = np.ones((limit + 1) // 2, dtype=bool)
+    is_prime[0] = False  # 1
+    for k in range(1, (isqrt(limit) - 1) // 2 + 1):
+        if is_prime[k]:
+            p = 2 * k + 1
+            is_prime[p * p // 2 :: p] = False
+    return np.concatenate([[2], 2 * np.flatnonzero(is_prime) + 1]).astype(
+        np.int64
+    )
+
+
+def segment_bounds(
+    low: int, high: int, segment_slots: int = SEGMENT_SLOTS
+) -> Iterator[Tuple[int, int]]:
+    """Splits [low, high) into pieces of at most segment_slots odd numbers
+    each.  Every piece but the last starts and ends on an even number."""
+    start = low
+    while start < high:
+        stop = min((start // 2 + segment_slots) * 2, high)
+        yield start, stop
+        start = stop
+
+
+def sieve_odd_slots(low: int, high: int, base: np.ndarray) -> np.ndarray:
+    """Marks which odd numbers in [low, high) are prime.  Slot i of the result
+    stands for 2 * (low // 2 + i) + 1.
+
+    base must hold every prime up to the square root of high - 1; it may hold
+    more.
+    """
+    first_slot = low // 2
+    is_prime = np.ones(high // 2 - first_slot, dtype=bool)
+    if first_slot == 0 and len(is_prime):
+        is_prime[0] = False  # 1
+    odd = base[1:] if len(base) and base[0] == 2 else base
+    odd = odd[odd * odd < high]
+    # The first odd multiple of each prime that's in range and not below its
+    # square; anything smaller has a smaller factor to cross it off.
+    first = -(-low // odd) * odd
+    first += odd * (first % 2 == 0)
+    first = np.maximum(first, odd * odd)
+    for p, start in zip(odd.tolist(), (first // 2 - first_slot).tolist()):
+        is_prime[start::p] = False
+    return is_prime
+
+
+def primes_in_range(
+    low: int,
+    high: int,
+    base: Optional[np.ndarray] = None,
+    segment_slots: int = SEGMENT_SLOTS,
+) -> np.ndarray:
+    """All the primes p with low <= p < high, as an int64 array.
+
+    Work is in proportion to the size of the range, not to high, so this is
+    also the way to sieve a window far from zero.
+    """
+    low = max(low, 0)
+    if high <= low:
+        return np.zeros(0, dtype=np.int64)
+    if base is None:
+        base = small_primes(isqrt(high - 1))
+    pieces = []
+    if low <= 2 < high:
+        pieces.append(np.array([2], dtype=np.int64))
+    for start, stop in segment_bounds(low, high, segment_slots):
+        is_prime = sieve_odd_slots(start, stop, base)
+        pieces.append(2 * (np.flatnonzero(is_prime) + start // 2) + 1)
+    return np.concatenate(pieces).astype(np.int64)
+
+
+def sieve(up_to: int, segment_slots: int = SEGMENT_SLOTS) -> np.ndarray:
+    """All the primes below up_to, as an int64 array."""
+    return primes_in_range(0, up_to, None, segment_slots)
+
+
+def prime_chunks(
+    start: int = 0, segment_slots: int = SEGMENT_SLOTS
+) -> Iterator[np.ndarray]:
+    """Yields every prime >= start, in order, forever, as int64 arrays of
+    whatever a segment turns up.
+
+    Nothing needs a bound up front: the window just keeps moving up, and the
+    base primes are extended, by sieving the next stretch of them with the
+    ones already found, whenever the window gets past the square of the
+    largest.  Memory is one segment plus the primes up to the square root of
+    wherever the window has got to.
+    """
+    limit = 64
+    base = small_primes(limit)
+    low = max(start, 0)
+    if low <= 2:
+        yield np.array([2], dtype=np.int64)
+        low = 3
+    while True:
+        high = (low // 2 + segment_slots) * 2
+        while limit * limit < high:
+            # Everything up to limit is enough to sieve up to limit^2, so
+            # doubling it is always safe.
+            extension = primes_in_range(limit + 1, 2 * limit + 1, base)
+            base = np.concatenate([base, extension])
+            limit *= 2
+        is_prime = sieve_odd_slots(low, high, base)
+        if is_prime.any():
+            yield 2 * (np.flatnonzero(is_prime) + low // 2) + 1
+        low = high
+
+
+def primes_from(start: int = 0) -> Iterator[int]:
+    """Yields every prime >= start, one at a time, forever."""
+    for chunk in prime_chunks(start):
+        yield from chunk.tolist()
+
+
+def sieve_runs(
+    lows: np.ndarray, highs: np.ndarray, base: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Marks which numbers are prime in each of the ranges [lows[i],
+    highs[i]), one after another in a single array.
+
+    This is for lots of short ranges spread far apart, like the pieces of a
+    far-out spiral window, where sieving a whole segment per range would
+    mostly be wasted.  Each base prime crosses off its multiples in every
+    range at once, and base primes longer than every range, which can hit
+    each range at most once, are handled in a batch.
+    """
+    lows = np.asarray(lows, dtype=np.int64)
+    highs = np.asarray(highs, dtype=np.int64)
+    lengths = np.maximum(highs - lows, 0)
+    starts = np.concatenate([[0], np.cumsum(lengths)])
+    is_prime = np.ones(starts[-1], dtype=bool)
+    if not len(is_prime):
+        return is_prime
+    # 0 and 1.
+    for small in [0, 1]:
+        hit = (lows <= small) & (small < highs)
+        is_prime[starts[:-1][hit] + small - lows[hit]] = False
+    if base is None:
+        base = small_primes(isqrt(int(highs.max()) - 1))
+    longest = int(lengths.max())
+    # Nothing below p^2 needs crossing off by p; a smaller prime has it.
+    for p in base[base <= longest].tolist():
+        first = np.maximum(-(-lows // p) * p, p * p) - lows
+        counts = np.maximum(-(-(lengths - first) // p), 0)
+        total = int(counts.sum())
+        if not total:
+            continue
+        run = np.repeat(np.arange(len(lows)), counts)
+        step = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        is_prime[starts[run] + first[run] + p * step] = False
+    large = base[base > longest]
+    batch = max(1, (1 << 22) // len(lows))
+    for chunk in range(0, len(large), batch):
+        p = large[np.newaxis, chunk : chunk + batch]
+        first = np.maximum(-(-lows[:, np.newaxis] // p) * p, p * p)
+        run, prime = np.nonzero(first < highs[:, np.newaxis])
+        is_prime[starts[run] + first[run, prime] - lows[run]] = False
+    return is_prime
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Closed-form Ulam spiral coordinates, over whole NumPy arrays at once.
+
+This is the same path primes.spiral_out walks a step at a time: start at the
+center, then go left 1, up 1, right 2, down 2, left 3, up 3, and so on.  Step
+n of it is at offset (row, col) from the center, with rows counting down the
+screen.
+
+Legs come in pairs of equal length q: for odd q the pair runs left along the
+bottom and then up the left side; for even q it runs right along the top and
+then down the right side.  Once q is known, the offset follows from how far
+along the pair n is, and the other way around.
+"""
+
+from typing import Tuple
+import numpy as np  # type: ignore
+
+
+def spiral_offsets(n: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """The (row, col) offsets from the center of steps n of the spiral."""
+    n = np.asarray(n, dtype=np.int64)
+    # n is on the pair of legs q = e + 1, where e(e + 1) <= n < (e + 1)(e + 2)
+    # steps came before it.  The float estimate of e can be off by one for
+    # big n, so it gets fixed up in integers.
+    e = ((np.sqrt(4 * n.astype(np.float64) + 1) - 1) * 0.5).astype(np.int64)
+    e -= e * (e + 1) > n
+    e += (e + 1) * (e + 2) <= n
+    q = e + 1
+    along = n - e * q
+    # Shifts and masks rather than // and %, which are several times slower
+    # on big arrays.
+    odd = q & 1
+    sign = 1 - 2 * odd
+    # Where the pair starts: (q - 1) / 2 down and right for odd q, q / 2 up
+    # and left for even q.
+    corner = np.where(odd, e >> 1, -(q >> 1))
+    first_leg = along < q
+    rows = corner + np.where(first_leg, 0, sign * (along - q))
+    cols = corner + sign * np.where(first_leg, along, q)
+    return rows, cols
+
+
+def spiral_index(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """The step of the spiral at each (row, col) offset from the center; the
+    inverse of spiral_offsets."""
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    # Every offset is on exactly one of the four sides of its ring.
+    bottom = rows >= np.abs(cols)
+    left = ~bottom & (np.abs(rows) < -cols)
+    top = ~bottom & ~left & (rows < 0) & (cols >= rows) & (cols < -rows)
+    q = np.select(
+        [bottom, left, top], [2 * rows + 1, -2 * cols - 1, -2 * rows], 2 * cols
+    )
+    half = q >> 1
+    along = np.select(
+        [bottom, left, top],
+        [half - cols, q + half - rows, cols + half],
+        q + half + rows,
+    )
+    return (q - 1) * q + along
+
+
+def spiral_coords(
+    n: np.ndarray, square_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Where steps n land in a square_size square, as (row, col) indices, with
+    the spiral starting at the center as spiral_out has it."""
+    rows, cols = spiral_offsets(n)
+    center = square_size // 2
+    return rows + center, cols + center
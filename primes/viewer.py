@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""A pan-and-zoom viewer for the spiral, drawn from cached tiles.
+
+The spiral is cut into TILE_SIZE x TILE_SIZE pixel tiles.  At level 0 a
+pixel is one number, marked if it's prime, just like plot_primes.  Each level
+up halves the scale, so at level z a pixel covers a 2^z x 2^z square of
+numbers and shows the fraction of them that are prime; that's what keeps the
+diagonals visible when zoomed out, where single pixels would just alias.
+
+Tiles are rendered in a process pool as they come into view, with map_window,
+so no tile costs more than the numbers in it, however far out it is.
+Finished tiles go into an in-memory LRU cache and, optionally, a directory of
+.npy files, so panning back over somewhere, or coming back another day,
+doesn't render anything twice.  Until a tile arrives, its part of the view
+is left blank.
+
+Drag to pan, scroll or press +/- to zoom, and use the arrow keys to move a
+tile at a time.
+
+    $ python3 viewer.py --cache-dir tiles
+"""
+
+import argparse
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+import os
+
+import numpy as np  # type: ignore
+import matplotlib.pyplot as plt  # type: ignore
+
+from primes import map_window
+
+TILE_SIZE = 256
+# Zooming out further than this would make every tile cost
+# (TILE_SIZE * 2^MAX_LEVEL)^2 numbers.
+MAX_LEVEL = 4
+# Roughly how many numbers to test in one map_window call.
+CELL_CHUNK = 1 << 22
+
+
+class TileKey(NamedTuple):
+    level: int
+    # In tiles, from the one whose top left corner is the center of the
+    # spiral.
+    row: int
+    col: int
+
+
+def render_tile(key: TileKey) -> np.ndarray:
+    """The float32 image for a tile: at level 0, 1 for primes and 0 for the
+    rest; above that, the fraction of primes under each pixel."""
+    scale = 1 << key.level
+    span = TILE_SIZE * scale
+    top = key.row * span
+    left = key.col * span
+    image = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.float32)
+    # A band of whole pixel rows at a time, to keep temporaries small.
+    band = max(1, CELL_CHUNK // (span * scale))
+    for first in range(0, TILE_SIZE, band):
+        rows = min(band, TILE_SIZE - first)
+        is_prime = map_window(top + first * scale, left, rows * scale, span)
+        image[first : first + rows] = is_prime.reshape(
+            rows, scale, TILE_SIZE, scale
+        ).mean(axis=(1, 3))
+    return image
+
+
+class TileCache:
+    """An LRU cache of rendered tiles, backed by .npy files in cache_dir, if
+    there is one."""
+
+    def __init__(self, capacity: int = 512, cache_dir: Optional[str] = None):
+        self.capacity = capacity
+        self.cache_dir = cache_dir
+        self.tiles: "OrderedDict[TileKey, np.ndarray]" = OrderedDict()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key: TileKey) -> str:
+        return os.path.join(
+            self.cache_dir, f"{key.level}_{key.row}_{key.col}.npy"
+        )
+
+    def get(self, key: TileKey) -> Optional[np.ndarray]:
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+        if self.cache_dir is not None and os.path.exists(self.path(key)):
+            tile = np.load(self.path(key))
+            self.remember(key, tile)
+        return tile
+
+    def put(self, key: TileKey, tile: np.ndarray) -> None:
+        self.remember(key, tile)
+        if self.cache_dir is not None:
+            # Written under another name and moved into place, so that a
+            # half-written file never looks like a tile.
+            temporary = self.path(key) + ".tmp.npy"
+            np.save(temporary, tile)
+            os.replace(temporary, self.path(key))
+
+    def remember(self, key: TileKey, tile: np.ndarray) -> None:
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.capacity:
+            self.tiles.popitem(last=False)
+
+
+class TileViewer:
+    """Keeps track of where the view is, and puts together its image from
+    whatever tiles are ready, asking the pool for the rest."""
+
+    def __init__(
+        self,
+        view_size: Tuple[int, int] = (768, 768),
+        workers: Optional[int] = None,
+        cache: Optional[TileCache] = None,
+    ):
+        self.view_height, self.view_width = view_size
+        self.cache = cache or TileCache()
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.pending: Dict[TileKey, Future] = {}
+        self.level = 0
+        # Where the middle of the view is, in numbers from the center of the
+        # spiral; these stay put while zooming.
+        self.center_row = 0.0
+        self.center_col = 0.0
+
+    def close(self) -> None:
+        for future in self.pending.values():
+            future.cancel()
+        self.pool.shutdown()
+
+    def origin(self) -> Tuple[int, int]:
+        """The top left pixel of the view, in pixels at the current level."""
+        scale = 1 << self.level
+        return (
+            int(np.floor(self.center_row / scale)) - self.view_height // 2,
+            int(np.floor(self.center_col / scale)) - self.view_width // 2,
+        )
+
+    def visible_tiles(self) -> Iterator[TileKey]:
+        top, left = self.origin()
+        for row in range(
+            top // TILE_SIZE, (top + self.view_height - 1) // TILE_SIZE + 1
+        ):
+            for col in range(
+                left // TILE_SIZE,
+                (left + self.view_width - 1) // TILE_SIZE + 1,
+            ):
+                yield TileKey(self.level, row, col)
+
+    def request(self, key: TileKey) -> Optional[np.ndarray]:
+        """The tile if it's ready; otherwise, makes sure it's on its way."""
+        tile = self.cache.get(key)
+        if tile is None and key not in self.pending:
+            self.pending[key] = self.pool.submit(render_tile, key)
+        return tile
+
+    def collect(self) -> bool:
+        """Moves finished tiles into the cache; returns whether there were
+        any."""
+        done = [key for key, future in self.pending.items() if future.done()]
+        for key in done:
+            self.cache.put(key, self.pending.pop(key).result())
+        return bool(done)
+
+    def compose(self) -> np.ndarray:
+        """The image for the current view, with NaN where a tile is still
+        missing.  Pending tiles that have scrolled out of view are
+        dropped."""
+        top, left = self.origin()
+        image = np.full(
+            (self.view_height, self.view_width), np.nan, dtype=np.float32
+        )
+        visible = set()
+        for key in self.visible_tiles():
+            visible.add(key)
+            tile = self.request(key)
+            if tile is None:
+                continue
+            # Where the tile and the view overlap, in view pixels.
+            tile_top = key.row * TILE_SIZE - top
+            tile_left = key.col * TILE_SIZE - left
+            rows = slice(
+                max(tile_top, 0), min(tile_top + TILE_SIZE, self.view_height)
+            )
+            cols = slice(
+                max(tile_left, 0), min(tile_left + TILE_SIZE, self.view_width)
+            )
+            image[rows, cols] = tile[
+                rows.start - tile_top : rows.stop - tile_top,
+                cols.start - tile_left : cols.stop - tile_left,
+            ]
+        for key in [key for key in self.pending if key not in visible]:
+            if self.pending[key].cancel():
+                del self.pending[key]
+        return image
+
+    def pan(self, rows: float, cols: float) -> None:
+        """Moves the view by rows and cols pixels at the current level."""
+        scale = 1 << self.level
+        self.center_row += rows * scale
+        self.center_col += cols * scale
+
+    def zoom(self, levels: int) -> None:
+        """Zooms out by levels, or in, for negative levels."""
+        self.level = min(max(self.level + levels, 0), MAX_LEVEL)
+
+
+def show(viewer: TileViewer) -> None:
+    """Runs the viewer in a matplotlib window until it's closed."""
+    fig, ax = plt.subplots()
+    image = ax.imshow(viewer.compose(), vmin=0, vmax=1, cmap="viridis")
+    ax.axis("off")
+    fig.canvas.manager.set_window_title("Ulam Spiral")
+    drag: Dict[str, Tuple[float, float]] = {}
+
+    def redraw() -> None:
+        ax.set_title(
+            f"Level {viewer.level}: center "
+            f"({int(viewer.center_row)}, {int(viewer.center_col)})"
+        )
+        # Zoomed out, a pixel's a density, which is never anywhere near 1.
+        top = 1 if viewer.level == 0 else 0.5
+        image.set_clim(0, top)
+        image.set_data(viewer.compose())
+        fig.canvas.draw_idle()
+
+    def on_key(event) -> None:
+        moves = {
+            "up": (-TILE_SIZE // 2, 0),
+            "down": (TILE_SIZE // 2, 0),
+            "left": (0, -TILE_SIZE // 2),
+            "right": (0, TILE_SIZE // 2),
+        }
+        if event.key in moves:
+            viewer.pan(*moves[event.key])
+        elif event.key in ["+", "="]:
+            viewer.zoom(-1)
+        elif event.key == "-":
+            viewer.zoom(1)
+        else:
+            return
+        redraw()
+
+    def on_scroll(event) -> None:
+        viewer.zoom(-1 if event.button == "up" else 1)
+        redraw()
+
+    def on_press(event) -> None:
+        if event.inaxes is ax:
+            drag["from"] = (event.ydata, event.xdata)
+
+    def on_motion(event) -> None:
+        if "from" in drag and event.inaxes is ax:
+            from_row, from_col = drag["from"]
+            viewer.pan(from_row - event.ydata, from_col - event.xdata)
+            drag["from"] = (event.ydata, event.xdata)
+            redraw()
+
+    def on_release(event) -> None:
+        drag.pop("from", None)
+
+    def on_timer() -> None:
+        if viewer.collect():
+            redraw()
+
+    fig.canvas.mpl_connect("key_press_event", on_key)
+    fig.canvas.mpl_connect("scroll_event", on_scroll)
+    fig.canvas.mpl_connect("button_press_event", on_press)
+    fig.canvas.mpl_connect("motion_notify_event", on_motion)
+    fig.canvas.mpl_connect("button_release_event", on_release)
+    timer = fig.canvas.new_timer(interval=100)
+    timer.add_callback(on_timer)
+    timer.start()
+    redraw()
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explore the Ulam spiral.")
+    parser.add_argument(
+        "--cache-dir", help="keep rendered tiles in this directory"
+    )
+    parser.add_argument("--cache-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    viewer = TileViewer(
+        workers=args.workers, cache=TileCache(args.cache_size, args.cache_dir)
+    )
+    try:
+        show(viewer)
+    finally:
+        viewer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""The rules of snake, with no curses in sight.
+
+The board is a bytearray with one byte per cell saying what's there, and
+cells are named by a single integer, row * width + col.  The snake is a
+deque of those ids, tail first, so a move pushes one onto the head and pops
+one off the tail; between that and looking up the cell being moved into, a
+tick is a constant amount of work however long the snake gets.
+
+Nothing here draws anything.  Instead, every cell whose contents change gets
+noted, and whatever's displaying the game picks those up with
+take_changes() after each move and redraws just them.
+"""
+
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+import random
+
+FOOD_VALUE = 3
+
+# What's in each cell of the board.
+EMPTY = 0
+BODY = 1
+FOOD = 2
+DOOR = 3
+POISON = 4
+
+
+class DeathException(Exception):
+    """Exception that signals that the player has died, and why."""
+
+    def __init__(self, message):
+        super().__init__(self)
+        self.message = message
+
+
+class WinException(Exception):
+    """Exception that signals that the player has won."""
+
+
+class SnakeEngine:
+    """The board and the snake on it.  The snake starts out one cell long, in
+    the middle, heading right, and grows to length over its first moves."""
+
+    def __init__(
+        self,
+        height: int,
+        width: int,
+        length: int,
+        rng: Optional[random.Random] = None,
+    ):
+        self.height = height
+        self.width = width
+        self.rng = rng or random.Random()
+        self.board = bytearray(height * width)
+        self.body: Deque[int] = deque()
+        self.changes: List[int] = []
+        self.add_length = length - 1
+        self.vector = (0, 1)
+        self.set_cell(self.cell(height // 2, width // 2), BODY)
+        self.body.append(self.cell(height // 2, width // 2))
+        self.place(FOOD)
+        self.place(DOOR)
+        self.place(POISON)
+
+    def cell(self, row: int, col: int) -> int:
+        return row * self.width + col
+
+    def coords(self, cell: int) -> Tuple[int, int]:
+        return divmod(cell, self.width)
+
+    @property
+    def head(self) -> int:
+        return self.body[-1]
+
+    def set_cell(self, cell: int, contents: int) -> None:
+        self.board[cell] = contents
+        self.changes.append(cell)
+
+    def take_changes(self) -> List[int]:
+        """The cells that have changed since the last call, in the order
+        they changed; the same cell may come up more than once."""
+        changes = self.changes
+        self.changes = []
+        return changes
+
+    def pick_clear_cell(self) -> int:
+        cell = self.rng.randrange(len(self.board))
+        while self.board[cell] != EMPTY:
+            cell = self.rng.randrange(len(self.board))
+        return cell
+
+    def place(self, contents: int) -> None:
+        self.set_cell(self.pick_clear_cell(), contents)
+
+    def move(self) -> None:
+        """Moves the snake one cell along self.vector.  Raises DeathException
+        or WinException if that ends the game, in which case nothing moves."""
+        row, col = self.coords(self.head)
+        d_row, d_col = self.vector
+        row += d_row
+        col += d_col
+        if col < 0 or row < 0 or col > self.width - 1 or row > self.height - 1:
+            raise DeathException("You ran into a wall.")
+        cell = self.cell(row, col)
+        contents = self.board[cell]
+        if contents == POISON:
+            raise DeathException("You ate the poison.")
+        if contents == DOOR:
+            raise WinException()
+        if contents == BODY:
+            # Even the tail, which would have moved out of the way; the
+            # snake has never been able to chase its own tail.
+            raise DeathException("You bit yourself.")
+        if contents == FOOD:
+            self.add_length += FOOD_VALUE
+        # The old head changes from head to body, even though the board
+        # doesn't.
+        self.changes.append(self.head)
+        self.set_cell(cell, BODY)
+        self.body.append(cell)
+        if self.add_length > 0:
+            self.add_length -= 1
+        else:
+            self.set_cell(self.body.popleft(), EMPTY)
+        if contents == FOOD:
+            self.place(FOOD)
+            self.place(POISON)
+
+    def trim(self) -> int:
+        """Takes a cell off the tail, for clearing the snake away once the
+        game's over; returns which one."""
+        cell = self.body.popleft()
+        self.set_cell(cell, EMPTY)
+        return cell
@@ -1,61 +1,31 @@
 #!/usr/bin/env python3
 
-from typing import List, Dict, Optional
+from typing import Dict
 import curses
-import random
 import time
 
+from engine import (
+    BODY,
+    DOOR,
+    EMPTY,
+    FOOD,
+    POISON,
+    DeathException,
+    SnakeEngine,
+    WinException,
+)
+
 MOVE_PERIOD_SECONDS = 1 / 10
 SLEEP_TIME = MOVE_PERIOD_SECONDS / 4
-FOOD_VALUE = 3
 FOOD_CHAR = "$"
 DOOR_CHAR = "#"
 POISON_CHAR = "\u2620"
 
 
-class DeathException(Exception):
-    """Exception that signals that the player has died, and why."""
-
-    def __init__(self, message):
-        super().__init__(self)
-        self.message = message
-
-
-class WinException(Exception):
-    """Exception that signals that the player has won."""
-
-
-class Player:
-    """This object holds all about the player's location and score."""
-
-    def __init__(self, coords: List[int], length: int):
-        self.coords = coords
-        self.drawings: List[List[int]]
-        self.drawings = []
-        self.add_length = length
-        self.vector = [0, 1]
-
-    def set_coords(self, coords: List[int]) -> Optional[List[int]]:
-        self.drawings.append(coords)
-        self.coords = coords
-        if self.add_length > 0:
-            self.add_length -= 1
-            return None
-        coords = self.drawings[0]
-        self.drawings = self.drawings[1:]
-        return coords
-
-    def eat_food(self, how_much: int) -> None:
-        self.add_length += how_much
-
-    def trim(self) -> List[int]:
-        coords = self.drawings[0]
-        self.drawings = self.drawings[1:]
-        return coords
-
-
 class SnakeGame:
-    """This is a simple snake game modeled after various older games."""
+    """This is a simple snake game modeled after various older games.  The
+    game itself is in engine.SnakeEngine; this just shows it with curses and
+    takes the keys."""
 
     def __init__(self, window, height: int, width: int):
         self.done = False
@@ -70,49 +40,22 @@ class SnakeGame:
             "Avoid poison \u2620, eat food $, go out door # to win. Steer with hjkl/arrows."
         )
 
-        self.poison_locations: Dict[str, bool]
-        self.poison_locations = {}
         game_width = width - 2  # space for borders
         game_height = height - 4  # space for borders and status
         self.game_area = curses.newwin(game_height, game_width, 3, 1)
-        self.player = Player([game_height // 2, game_width // 2], 5)
-        self.draw_player(self.player.coords)
-        self.place_food()
-        self.place_door()
-        self.place_poison()
+        self.engine = SnakeEngine(game_height, game_width, 5)
+        self.chars: Dict[int, str] = {
+            EMPTY: " ",
+            FOOD: FOOD_CHAR,
+            DOOR: DOOR_CHAR,
+            POISON: POISON_CHAR,
+        }
+        self.draw_changes()
         self.game_area.refresh()
 
-    def pick_clear_location(self) -> List[int]:
+    def draw_char(self, cell: int, char: str) -> None:
         (height, width) = self.game_area.getmaxyx()
-
-        def pick_location():
-            row = random.randint(0, height - 1)
-            col = random.randint(0, width - 1)
-            return [row, col]
-
-        coords = pick_location()
-        while (str(coords) in self.poison_locations) or (
-            self.game_area.inch(coords[0], coords[1]) & 0xFF  # type: ignore
-        ) != ord(" "):
-            coords = pick_location()
-        return coords
-
-    def place_door(self) -> None:
-        door_location = self.pick_clear_location()
-        self.draw_char(door_location, DOOR_CHAR)
-
-    def place_food(self) -> None:
-        food_location = self.pick_clear_location()
-        self.draw_char(food_location, FOOD_CHAR)
-
-    def place_poison(self) -> None:
-        location = self.pick_clear_location()
-        self.poison_locations[str(location)] = True
-        self.draw_char(location, POISON_CHAR)
-
-    def draw_char(self, coords: List[int], char: str) -> None:
-        (height, width) = self.game_area.getmaxyx()
-        row, col = coords
+        row, col = self.engine.coords(cell)
         # Curses can't addch to the bottom right corner without ERR.
         # https://stackoverflow.com/questions/36387625/curses-fails-when-calling-addch-on-the-bottom-right-corner
         if row == height - 1 and col == width - 1:
@@ -120,46 +63,24 @@ class SnakeGame:
         else:
             self.game_area.addch(row, col, char)
 
-    def draw_player(self, coords: List[int]) -> None:
-        self.draw_char(self.player.coords, "s")
-        to_erase = self.player.set_coords(coords)
-        self.draw_char(self.player.coords, "S")
-        if to_erase:
-            self.draw_char(to_erase, " ")
+    def draw_changes(self) -> None:
+        """Redraws whatever the engine has changed since last time."""
+        for cell in self.engine.take_changes():
+            contents = self.engine.board[cell]
+            if contents == BODY:
+                char = "S" if cell == self.engine.head else "s"
+            else:
+                char = self.chars[contents]
+            self.draw_char(cell, char)
 
     def move_player(self) -> None:
-        (height, width) = self.game_area.getmaxyx()
-        p_y, p_x = self.player.coords
-        v_y, v_x = self.player.vector
-        p_y += v_y
-        p_x += v_x
-        if p_x < 0 or p_y < 0 or p_x > width - 1 or p_y > height - 1:
-            raise DeathException("You ran into a wall.")
-
-        if str([p_y, p_x]) in self.poison_locations:
-            raise DeathException("You ate the poison.")
-
-        need_more_food = False
-        hit_char = self.game_area.inch(p_y, p_x) & 0xFF  # type: ignore
-        if hit_char == ord(" "):
-            pass
-        elif hit_char == ord(FOOD_CHAR):
-            self.player.eat_food(FOOD_VALUE)
-            need_more_food = True
-        elif hit_char == ord(DOOR_CHAR):
-            raise WinException()
-        else:
-            raise DeathException("You bit yourself.")
-
-        self.draw_player([p_y, p_x])
-        if need_more_food:
-            self.place_food()
-            self.place_poison()
+        self.engine.move()
+        self.draw_changes()
 
     def die(self, cause_of_death: str) -> None:
-        for coords in self.player.drawings:
-            self.draw_char(coords, "x")
-        self.draw_char(self.player.coords, "X")
+        for cell in self.engine.body:
+            self.draw_char(cell, "x")
+        self.draw_char(self.engine.head, "X")
         self.game_area.refresh()
         self.set_status(
             cause_of_death + "  You have died.  Press 'q' to quit."
@@ -168,47 +89,47 @@ class SnakeGame:
 
     def win(self) -> None:
         self.set_status(
-            f"You have gotten away with {len(self.player.drawings)} points.  Press 'q' to quit."
+            f"You have gotten away with {len(self.engine.body)} points.  Press 'q' to quit."
         )
-        self.draw_char(self.player.coords, "s")
+        self.draw_char(self.engine.head, "s")
         self.done = True
 
     def play(self) -> None:
         next_draw = time.time() + MOVE_PERIOD_SECONDS
-        last_move_vector = self.player.vector
+        last_move_vector = self.engine.vector
         while True:
             time.sleep(SLEEP_TIME)
             char = self.window.getch()
             if char == ord("q"):
                 break
             map_directions = {
-                ord("h"): [0, -1],
-                curses.KEY_LEFT: [0, -1],
-                ord("l"): [0, 1],
-                curses.KEY_RIGHT: [0, 1],
-                ord("k"): [-1, 0],
-                curses.KEY_UP: [-1, 0],
-                ord("j"): [1, 0],
-                curses.KEY_DOWN: [1, 0],
+                ord("h"): (0, -1),
+                curses.KEY_LEFT: (0, -1),
+                ord("l"): (0, 1),
+                curses.KEY_RIGHT: (0, 1),
+                ord("k"): (-1, 0),
+                curses.KEY_UP: (-1, 0),
+                ord("j"): (1, 0),
+                curses.KEY_DOWN: (1, 0),
             }
             if char in map_directions:
-                [d_y, d_x] = map_directions[char]
+                (d_y, d_x) = map_directions[char]
                 # Don't let the user accidentally turn right back at themselves.
-                # Cache last_move_vector rather than using self.player.vector in
+                # Cache last_move_vector rather than using self.engine.vector in
                 # case they hit multiple keys before the snake actually moves.
-                if last_move_vector != [-d_y, -d_x]:
-                    self.player.vector = [d_y, d_x]
+                if last_move_vector != (-d_y, -d_x):
+                    self.engine.vector = (d_y, d_x)
             current_time = time.time()
             try:
                 if current_time >= next_draw:
                     next_draw = current_time + MOVE_PERIOD_SECONDS
                     if not self.done:
-                        last_move_vector = self.player.vector
+                        last_move_vector = self.engine.vector
                         self.move_player()
                         self.game_area.refresh()
-                    elif self.player.drawings:
-                        to_erase = self.player.trim()
-                        self.draw_char(to_erase, " ")
+                    elif self.engine.body:
+                        self.engine.trim()
+                        self.draw_changes()
                         self.game_area.refresh()
 
             except DeathException as err: